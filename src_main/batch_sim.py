@@ -0,0 +1,154 @@
+##########################################################################
+#
+# MTraceCheck
+# Copyright 2017 The Regents of the University of Michigan
+# Doowon Lee and Valeria Bertacco
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+##########################################################################
+
+#
+# Lockstep simulation of a batch of executions (NumPy required)
+#
+# NOTE: Every execution performs exactly one instruction per step, so all
+#       executions in a batch finish after the same number of steps
+#       (total number of instructions). Per-execution state is kept in
+#       (numExecs, ...) arrays and each step is a handful of array operations.
+#
+# NOTE: The semantics are the same as gen_mtrand.py (simulateExecution):
+#       at each step, a thread is chosen uniformly among unfinished threads,
+#       and an instruction is chosen uniformly among ready instructions of
+#       the thread (in scheduling window, all intra-thread dependencies
+#       performed). Random choices are different from the scalar scheduler.
+#
+
+import numpy
+import instruction
+
+def simulateBatch(compactProg, numMemLocs, numHistRegs, numOutstandingOps, numExecs, seed):
+    numThreads = compactProg.numThreads
+    numInsts = compactProg.numInsts
+    rng = numpy.random.default_rng(seed)
+
+    ## Static information
+    # NOTE: Per-thread state uses a padded layout (thread * maxThreadInsts + inst),
+    #       so that the state of the chosen thread is a contiguous row
+    threadStart = numpy.array(compactProg.threadStart, dtype=numpy.int64)
+    numThreadInsts = threadStart[1:] - threadStart[:-1]
+    if (numThreads > 0):
+        maxThreadInsts = max(1, int(numThreadInsts.max()))
+    else:
+        maxThreadInsts = 1
+    threadOf = numpy.array(compactProg.threadIndex, dtype=numpy.int64)
+    paddedIndex = threadOf * maxThreadInsts + (numpy.arange(numInsts, dtype=numpy.int64) - threadStart[threadOf])
+    instType = numpy.array(compactProg.instType, dtype=numpy.int8)
+    address = numpy.array(compactProg.address, dtype=numpy.int64)
+    memOp = numpy.array(compactProg.memOp, dtype=numpy.int64)
+    reverseDepPtr = numpy.array(compactProg.reverseDepPtr, dtype=numpy.int64)
+    reverseDepPadded = paddedIndex[numpy.array(compactProg.reverseDepIdx, dtype=numpy.int64)]
+    reverseDepOffset = reverseDepPadded % maxThreadInsts
+    intraDepPtr = numpy.array(compactProg.intraDepPtr, dtype=numpy.int64)
+    execIndices = numpy.arange(numExecs, dtype=numpy.int64)
+
+    ## Per-execution state
+    # pendingDeps[e][padded]: number of intra-thread dependencies not yet performed
+    # ready[e][padded]: True if ready (in scheduling window, not performed, no pending dependency)
+    # retired[e][thread]: number of performed instructions in thread
+    # mem[e][address]: memory contents
+    # value[e][flat]: loaded value
+    # retireStep[e][flat]: step when the instruction was performed (for ordering load-value history)
+    initPendingDeps = numpy.zeros(numThreads * maxThreadInsts, dtype=numpy.int32)
+    initPendingDeps[paddedIndex] = intraDepPtr[1:] - intraDepPtr[:-1]
+    initReady = numpy.zeros(numThreads * maxThreadInsts, dtype=bool)
+    windowLen = numpy.minimum(numOutstandingOps, numThreadInsts)
+    for thread in range(numThreads):
+        base = thread * maxThreadInsts
+        initReady[base:base+windowLen[thread]] = (initPendingDeps[base:base+windowLen[thread]] == 0)
+    pendingDeps = numpy.tile(initPendingDeps, (numExecs, 1))
+    ready = numpy.tile(initReady, (numExecs, 1))
+    readyPerThread = ready.reshape(numExecs, numThreads, maxThreadInsts)
+    retired = numpy.zeros((numExecs, numThreads), dtype=numpy.int64)
+    initMem = numpy.array([instruction.getMemOp(0xffff, i) for i in range(numMemLocs)], dtype=numpy.int64)
+    mem = numpy.tile(initMem, (numExecs, 1))
+    value = numpy.full((numExecs, numInsts), 0xffffffff, dtype=numpy.int64)
+    retireStep = numpy.zeros((numExecs, numInsts), dtype=numpy.int64)
+
+    for step in range(numInsts):
+        ## Choose a thread to execute (uniformly among unfinished threads)
+        unfinished = retired < numThreadInsts[None, :]
+        numUnfinished = unfinished.sum(axis=1)
+        randInt = (rng.random(numExecs) * numUnfinished).astype(numpy.int64)
+        thread = numpy.argmax(numpy.cumsum(unfinished, axis=1) > randInt[:, None], axis=1)
+
+        ## Choose an instruction to execute (uniformly among ready instructions of the thread)
+        threadReady = readyPerThread[execIndices, thread]
+        readyCount = numpy.cumsum(threadReady, axis=1, dtype=numpy.int64)
+        randInt = (rng.random(numExecs) * readyCount[:, -1]).astype(numpy.int64)
+        inst = numpy.argmax(readyCount > randInt[:, None], axis=1)
+        flat = threadStart[thread] + inst
+        padded = thread * maxThreadInsts + inst
+
+        ## Execute the instruction
+        flatType = instType[flat]
+        flatAddress = address[flat]
+        isLoad = (flatType == 0)
+        isStore = (flatType == 1)
+        value[execIndices[isLoad], flat[isLoad]] = mem[execIndices[isLoad], flatAddress[isLoad]]
+        mem[execIndices[isStore], flatAddress[isStore]] = memOp[flat[isStore]]
+        ready[execIndices, padded] = False
+        retireStep[execIndices, flat] = step
+        retired[execIndices, thread] += 1
+        windowLen = numpy.minimum(retired[execIndices, thread] + numOutstandingOps, numThreadInsts[thread])
+
+        ## Wake up dependent instructions (only those in scheduling window)
+        numDependents = reverseDepPtr[flat+1] - reverseDepPtr[flat]
+        totalDependents = int(numDependents.sum())
+        if (totalDependents > 0):
+            rowIndices = numpy.repeat(execIndices, numDependents)
+            ptrBase = numpy.repeat(reverseDepPtr[flat] - (numpy.cumsum(numDependents) - numDependents), numDependents)
+            depPtr = ptrBase + numpy.arange(totalDependents)
+            depPadded = reverseDepPadded[depPtr]
+            numpy.subtract.at(pendingDeps, (rowIndices, depPadded), 1)
+            wakeUp = (pendingDeps[rowIndices, depPadded] == 0) & (reverseDepOffset[depPtr] < windowLen[rowIndices])
+            ready[rowIndices[wakeUp], depPadded[wakeUp]] = True
+
+        ## Add next instruction to scheduling window
+        entering = (windowLen > retired[execIndices, thread] - 1 + numOutstandingOps)
+        entering &= (retired[execIndices, thread] - 1 + numOutstandingOps < numThreadInsts[thread])
+        enteringPadded = thread[entering] * maxThreadInsts + windowLen[entering] - 1
+        enteringExecs = execIndices[entering]
+        ready[enteringExecs, enteringPadded] = (pendingDeps[enteringExecs, enteringPadded] == 0)
+
+    ## Load-value history
+    # NOTE: Loaded values are appended to a history register in the order
+    #       in which loads are performed (see gen_mtrand.py)
+    historyLoadTargets = [[[[] for i in range(numHistRegs)] for j in range(numThreads)] for e in range(numExecs)]
+    for thread in range(numThreads):
+        loadsPerReg = dict()
+        for flat in range(compactProg.threadStart[thread], compactProg.threadStart[thread+1]):
+            if (compactProg.instType[flat] == 0):
+                loadTarget = compactProg.loadTarget[flat]
+                if (not loadTarget in loadsPerReg):
+                    loadsPerReg[loadTarget] = []
+                loadsPerReg[loadTarget].append(flat)
+        for loadTarget in loadsPerReg:
+            loadFlats = numpy.array(loadsPerReg[loadTarget], dtype=numpy.int64)
+            order = numpy.argsort(retireStep[:, loadFlats], axis=1, kind="stable")
+            orderedValues = numpy.take_along_axis(value[:, loadFlats], order, axis=1).tolist()
+            for e in range(numExecs):
+                historyLoadTargets[e][thread][loadTarget] = orderedValues[e]
+
+    memList = mem.tolist()
+    valueList = value.tolist()
+    return [{"mem": memList[e], "history": historyLoadTargets[e], "loadValues": valueList[e]} for e in range(numExecs)]
@@ -0,0 +1,189 @@
+#!/usr/bin/python
+
+##########################################################################
+#
+# MTraceCheck
+# Copyright 2017 The Regents of the University of Michigan
+# Doowon Lee and Valeria Bertacco
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+##########################################################################
+
+#
+# Campaign of random tests (matrix of configurations and seeds)
+#
+# NOTE: Each test goes through the same stages as gen_mtrand.py and
+#       value_profiler.py in Makefile, in a warm worker process:
+#       (1) program generation (prog.txt, wo.txt), (2) simulation (hist.txt),
+#       and (3) value profiling (test.txt, input of codegen.py).
+#       Each test is written in its own directory, and per-stage timings
+#       are summarized in a campaign manifest.
+#
+
+import os
+import sys
+import time
+import itertools
+import argparse
+import multiprocessing
+import gen_mtrand
+import parse_prog
+import value_profiler
+
+""" Manifest format (CSV, one line per test in test-index order)
+index,dir,model,threads,insts,locs,seed,execs,unique,gen_time,sim_time,profile_time,total_time
+0,sc_t2_i50_l32_s1,sc,2,50,32,1,1000,12,0.003,0.210,0.002,0.215
+...
+"""
+
+# Parse a comma-separated list of values and ranges (e.g., 1,4-6 => [1, 4, 5, 6])
+def parseIntList(string):
+    values = []
+    for eachRange in string.split(","):
+        rangeMinMax = eachRange.split("-")
+        if (len(rangeMinMax) == 1):
+            values.append(int(rangeMinMax[0]))
+        elif (len(rangeMinMax) == 2):
+            for i in range(int(rangeMinMax[0]), int(rangeMinMax[1]) + 1):
+                values.append(i)
+        else:
+            print("Error: Unrecognized range %s" % (eachRange))
+            sys.exit(1)
+    return values
+
+# Run all stages of a test
+# NOTE: This function is called in worker processes
+def runTest(test):
+    timings = dict()
+    startTime = time.time()
+    testDir = test["dir"]
+    if (not os.path.exists(testDir)):
+        os.makedirs(testDir)
+    progFileName = "%s/prog.txt" % (testDir)
+    woFileName = "%s/wo.txt" % (testDir)
+
+    ## 1. Program generation
+    stageTime = time.time()
+    program = gen_mtrand.generateProgram(test["config"])
+    gen_mtrand.writeProgramFiles(program, progFileName, woFileName)
+    timings["gen"] = time.time() - stageTime
+
+    ## 2. Simulation
+    # NOTE: Executions use per-execution seeds (same as gen_mtrand.py --seed-per-exec)
+    stageTime = time.time()
+    uniqueHistories = set()
+    histStrings = []
+    for (executionIndex, returnDict) in gen_mtrand.simulate(program, test["execs"], test["config"]["randSeed"], test["scheduler"]):
+        (executionIndex, dumpString, histString) = gen_mtrand.generateOutputStrings(program, executionIndex, returnDict, -1, False)
+        uniqueHistories.add(gen_mtrand.getHistoryKey(histString))
+        histStrings.append(histString)
+    histFP = open("%s/hist.txt" % (testDir), "w")
+    histFP.write("".join(histStrings))
+    histFP.close()
+    timings["sim"] = time.time() - stageTime
+
+    ## 3. Value profiling
+    stageTime = time.time()
+    if (test["profile"] != None):
+        returnDict = parse_prog.parseProgram(progFileName, None, False, 0)
+        value_profiler.generateIntermediateFile(returnDict["progInfo"], test["profile"], returnDict["storeTable"], "%s/test.txt" % (testDir), 0)
+    timings["profile"] = time.time() - stageTime
+
+    timings["total"] = time.time() - startTime
+    return (test["index"], len(uniqueHistories), timings)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Arguments for %s" % __file__)
+    parser.add_argument("--verbose", "-v", action="count", default=0)
+    parser.add_argument("--threads", "-t", help="numbers of threads (e.g., 2,4)", default="2")
+    parser.add_argument("--insts", "-i", help="numbers of memory operations for each thread (e.g., 50,100)", default="10")
+    parser.add_argument("--locs", "-l", help="numbers of memory target locations (e.g., 8,32)", default="4")
+    parser.add_argument("--consistency-models", help="consistency models (e.g., sc,tso)", default="sc")
+    parser.add_argument("--seeds", help="random seeds (e.g., 1-100)", default="894291")
+    parser.add_argument("--outstanding", "-o", type=int, help="number of outstanding memory operations for each thread (-1: entire range)", default=-1)
+    parser.add_argument("--execs", "-e", type=int, help="number of simulated executions for each test", default=10)
+    parser.add_argument("--hist-regs", type=int, help="number of registers to save loaded value", default=16)
+    parser.add_argument("--single-copy-atomicity", action="store_true", default=False)
+    parser.add_argument("--with-fences", action="store_true", default=False)
+    parser.add_argument("--scheduler", choices=["window", "event", "store-buffer"], help="instruction scheduler for simulation (see gen_mtrand.py)", default="event")
+    parser.add_argument("--no-profile", action="store_true", help="generate test.txt without profile instructions (value_profiler.py --no-profile)", default=False)
+    parser.add_argument("--no-test-files", action="store_true", help="do not generate test.txt (skip value profiling)", default=False)
+    parser.add_argument("--campaign-dir", help="directory to save test directories and manifest", default="campaign")
+    parser.add_argument("--manifest-file", help="campaign manifest file name, saved in --campaign-dir", default="manifest.csv")
+    parser.add_argument("--jobs", "-j", type=int, help="number of worker processes (default: number of cores)", default=multiprocessing.cpu_count())
+    args = parser.parse_args()
+
+    verbosity = args.verbose
+    if (args.jobs < 1):
+        print("Error: Number of jobs should be positive (%d)" % args.jobs)
+        sys.exit(1)
+    if (args.no_test_files):
+        profile = None
+    else:
+        profile = not args.no_profile
+
+    ## Test matrix
+    for model in args.consistency_models.split(","):
+        gen_mtrand.getOrderingRules(model)  # Exit if unrecognized (before starting workers)
+    tests = []
+    for (model, numThreads, numInsts, numMemLocs, seed) in itertools.product(args.consistency_models.split(","), parseIntList(args.threads), parseIntList(args.insts), parseIntList(args.locs), parseIntList(args.seeds)):
+        config = gen_mtrand.getDefaultConfig()
+        config["numThreads"] = numThreads
+        config["numInsts"] = numInsts
+        config["numMemLocs"] = numMemLocs
+        config["numOutstandingOps"] = args.outstanding
+        config["numHistRegs"] = args.hist_regs
+        config["consistencyModel"] = model
+        config["singleCopyAtomicity"] = args.single_copy_atomicity
+        config["withFences"] = args.with_fences
+        config["randSeed"] = seed
+        testName = "%s_t%d_i%d_l%d_s%d" % (model, numThreads, numInsts, numMemLocs, seed)
+        tests.append({"index": len(tests), "name": testName, "dir": "%s/%s" % (args.campaign_dir, testName),
+                      "config": config, "execs": args.execs, "scheduler": args.scheduler, "profile": profile})
+    if (verbosity > 0):
+        print("INFO: %d tests, %d worker processes" % (len(tests), args.jobs))
+    if (not os.path.exists(args.campaign_dir)):
+        os.makedirs(args.campaign_dir)
+
+    ## Run tests in warm worker processes
+    campaignStartTime = time.time()
+    results = dict()
+    if (args.jobs > 1):
+        pool = multiprocessing.Pool(args.jobs)
+        testResults = pool.imap_unordered(runTest, tests)
+    else:
+        pool = None
+        testResults = (runTest(test) for test in tests)
+    for (testIndex, numUniqueHistories, timings) in testResults:
+        results[testIndex] = (numUniqueHistories, timings)
+        if (verbosity > 0):
+            print("Test %s: %d unique histories (%.3f sec)" % (tests[testIndex]["name"], numUniqueHistories, timings["total"]))
+    if (pool != None):
+        pool.close()
+        pool.join()
+    campaignTime = time.time() - campaignStartTime
+
+    ## Campaign manifest
+    manifestFileName = "%s/%s" % (args.campaign_dir, args.manifest_file)
+    manifestFP = open(manifestFileName, "w")
+    manifestFP.write("index,dir,model,threads,insts,locs,seed,execs,unique,gen_time,sim_time,profile_time,total_time\n")
+    sumTimings = {"gen": 0.0, "sim": 0.0, "profile": 0.0, "total": 0.0}
+    for test in tests:
+        config = test["config"]
+        (numUniqueHistories, timings) = results[test["index"]]
+        manifestFP.write("%d,%s,%s,%d,%d,%d,%d,%d,%d,%.6f,%.6f,%.6f,%.6f\n" % (test["index"], test["name"], config["consistencyModel"], config["numThreads"], config["numInsts"], config["numMemLocs"], config["randSeed"], test["execs"], numUniqueHistories, timings["gen"], timings["sim"], timings["profile"], timings["total"]))
+        for stage in sumTimings:
+            sumTimings[stage] += timings[stage]
+    manifestFP.close()
+    print("INFO: %d tests in %.3f sec (generation %.3f, simulation %.3f, profiling %.3f sec in total across workers)" % (len(tests), campaignTime, sumTimings["gen"], sumTimings["sim"], sumTimings["profile"]))
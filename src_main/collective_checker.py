@@ -0,0 +1,312 @@
+#!/usr/bin/python
+
+##########################################################################
+#
+# MTraceCheck
+# Copyright 2017 The Regents of the University of Michigan
+# Doowon Lee and Valeria Bertacco
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+##########################################################################
+
+#
+# Collective graph checking (same algorithm as src_tsort/tsort.c with DIFF)
+#
+# NOTE: All executions share one topological order of instructions, which
+#       is initially a topological order of intra-thread dependencies.
+#       For each execution, inter-thread dependencies (reads-from and
+#       from-reads, see cycle_checker.py) are checked against the order.
+#       If all of them are consistent with the order, the execution is
+#       acyclic and skipped. Otherwise, only the window of the order
+#       between the leading index (earliest successor of inconsistent
+#       dependencies) and the trailing index (latest predecessor) is
+#       re-sorted, and the order is updated. Instructions outside the
+#       window keep their positions, because their dependencies to/from
+#       the window are already consistent with the order.
+#       If the window cannot be sorted, the execution has a cyclic
+#       dependency, and the order is not updated.
+#
+# NOTE: The program model is the one of parse_prog.py (getProgramModel()
+#       converts a program generated by gen_mtrand.py), and the history of
+#       an execution is history[thread][register index] = loaded values,
+#       either parsed by parse_hist.py or simulated by gen_mtrand.py.
+#
+
+import sys
+import argparse
+import collections
+import instruction
+import parse_prog
+import parse_hist
+
+""" Re-sort span format (same as tsort.c with RESORT_MEASURE)
+B,1,400,-1,-1
+C,2,400,37,251
+[B: skipped, C: re-sorted],[execution index],[number of instructions],[leading index],[trailing index]
+"""
+
+# Program model of a program generated by gen_mtrand.py (see parse_prog.parseProgram())
+def getProgramModel(program):
+    insts = program["insts"]
+    prog = dict()
+    intra = dict()
+    writeOrder = dict()
+    lookupInstFromLoad = dict()
+    for thread in range(len(insts)):
+        prog[thread] = dict()
+        intra[thread] = dict()
+        writeOrder[thread] = dict()
+        lookupInstFromLoad[thread] = dict()
+        for inst in range(len(insts[thread])):
+            prog[thread][inst] = insts[thread][inst].getAssembly()
+            intra[thread][inst] = [instruction.getInstIndex(intraDep) for intraDep in insts[thread][inst].intraDeps]
+            if (insts[thread][inst].instType == 0):
+                registerIndex = insts[thread][inst].loadTarget
+                if (not registerIndex in lookupInstFromLoad[thread]):
+                    lookupInstFromLoad[thread][registerIndex] = []
+                lookupInstFromLoad[thread][registerIndex].append(inst)
+            elif (insts[thread][inst].instType == 1 and program["orderStSt"]):
+                address = insts[thread][inst].address
+                if (not address in writeOrder[thread]):
+                    writeOrder[thread][address] = []
+                writeOrder[thread][address].append(inst)
+    return {"progInfo": prog, "intraDep": intra, "writeOrder": writeOrder, "lookupTable": lookupInstFromLoad}
+
+class CollectiveChecker:
+
+    ## Class variables
+    # nodes[i]: memOp of node i, nodeIndex[memOp] = i
+    # successors[i]: nodes that follow node i by intra-thread dependencies
+    # loadAddress[node]: address of a load
+    # nextStore[node]: node of the next store in write order (None if last), firstStores[address]: nodes of the first store of each thread
+    # topoOrder[position]: node at position of the topological order, order[node]: position of node
+
+    def __init__(self, progModel, singleCopyAtomicity=False):
+        prog = progModel["progInfo"]
+        intra = progModel["intraDep"]
+        writeOrder = progModel["writeOrder"]
+        self.lookupInstFromLoad = progModel["lookupTable"]
+        self.singleCopyAtomicity = singleCopyAtomicity
+        self.threads = sorted(prog.keys())
+
+        self.nodes = []
+        self.nodeIndex = dict()
+        for thread in self.threads:
+            for inst in sorted(prog[thread].keys()):
+                self.nodeIndex[instruction.getMemOp(thread, inst)] = len(self.nodes)
+                self.nodes.append(instruction.getMemOp(thread, inst))
+        numNodes = len(self.nodes)
+
+        self.successors = [[] for i in range(numNodes)]
+        self.loadAddress = [None] * numNodes
+        for thread in self.threads:
+            for inst in prog[thread]:
+                node = self.nodeIndex[instruction.getMemOp(thread, inst)]
+                for depInstIndex in intra[thread][inst]:
+                    self.successors[self.nodeIndex[instruction.getMemOp(thread, depInstIndex)]].append(node)
+                if (instruction.getInstType(prog[thread][inst]) == 0):  # load
+                    self.loadAddress[node] = instruction.getAddress(prog[thread][inst])
+
+        self.nextStore = [None] * numNodes
+        self.firstStores = dict()
+        for thread in self.threads:
+            for address in writeOrder[thread]:
+                storeNodes = [self.nodeIndex[instruction.getMemOp(thread, inst)] for inst in writeOrder[thread][address]]
+                for i in range(len(storeNodes) - 1):
+                    self.nextStore[storeNodes[i]] = storeNodes[i+1]
+                if (not address in self.firstStores):
+                    self.firstStores[address] = []
+                self.firstStores[address].append(storeNodes[0])
+
+        ## Initial order: topological order of intra-thread dependencies
+        self.topoOrder = list(range(numNodes))
+        self.order = list(range(numNodes))
+        sortedNodes = self.sortWindow(0, numNodes - 1, [])
+        if (len(sortedNodes) < numNodes):
+            print("Error: Cyclic intra-thread dependency")
+            sys.exit(1)
+        self.updateOrder(0, sortedNodes)
+
+    # Inter-thread dependencies of an execution: list of (a, b), node a precedes node b
+    # history[thread][register index]: loaded values (see parse_hist.py)
+    def getInterEdges(self, history):
+        nodeIndex = self.nodeIndex
+        interEdges = []
+        for thread in self.threads:
+            threadHistory = history[thread]
+            if (isinstance(threadHistory, dict)):
+                registerIndices = threadHistory.keys()
+            else:
+                registerIndices = range(len(threadHistory))
+            for registerIndex in registerIndices:
+                loadValues = threadHistory[registerIndex]
+                for loadIndex in range(len(loadValues)):
+                    # A (store) -> B (load)
+                    loadValue = loadValues[loadIndex]
+                    assert(loadIndex < len(self.lookupInstFromLoad[thread][registerIndex]))
+                    instIndex = self.lookupInstFromLoad[thread][registerIndex][loadIndex]
+                    aThreadIndex = instruction.getThreadIndex(loadValue)
+                    if (not self.singleCopyAtomicity and aThreadIndex == thread):
+                        # Load value is from a store in the same thread (ignored in multiple-copy atomicity)
+                        continue
+                    loadNode = nodeIndex[instruction.getMemOp(thread, instIndex)]
+                    if (aThreadIndex != 0xffff):
+                        # Reads-from dependency, and from-reads dependency to the next store in write order
+                        storeNode = nodeIndex[loadValue]
+                        interEdges.append((storeNode, loadNode))
+                        if (self.nextStore[storeNode] != None):
+                            interEdges.append((loadNode, self.nextStore[storeNode]))
+                    elif (self.loadAddress[loadNode] in self.firstStores):
+                        # From-reads dependencies to the first stores (initial value)
+                        for frNode in self.firstStores[self.loadAddress[loadNode]]:
+                            interEdges.append((loadNode, frNode))
+        return interEdges
+
+    # Topological sort of nodes in a window of the order (Kahn's algorithm)
+    # extraEdges: list of (a, b), only those in the window are used
+    # Returns sorted nodes (fewer than nodes in the window if cyclic)
+    # NOTE: Zeros are scanned and queued in the current order, so that the order is kept if possible
+    def sortWindow(self, leadingIndex, trailingIndex, extraEdges):
+        order = self.order
+        successors = self.successors
+        windowNodes = self.topoOrder[leadingIndex:trailingIndex+1]
+        counts = [0] * len(windowNodes)
+        extraSuccessors = dict()
+        for node in windowNodes:
+            for nextNode in successors[node]:
+                if (order[nextNode] <= trailingIndex):
+                    counts[order[nextNode] - leadingIndex] += 1
+        for (a, b) in extraEdges:
+            if (order[a] >= leadingIndex and order[a] <= trailingIndex and order[b] >= leadingIndex and order[b] <= trailingIndex):
+                counts[order[b] - leadingIndex] += 1
+                if (a in extraSuccessors):
+                    extraSuccessors[a].append(b)
+                else:
+                    extraSuccessors[a] = [b]
+        zeros = collections.deque([node for node in windowNodes if counts[order[node] - leadingIndex] == 0])
+        sortedNodes = []
+        while (len(zeros) > 0):
+            node = zeros.popleft()
+            sortedNodes.append(node)
+            for nextNode in successors[node]:
+                if (order[nextNode] <= trailingIndex):
+                    counts[order[nextNode] - leadingIndex] -= 1
+                    if (counts[order[nextNode] - leadingIndex] == 0):
+                        zeros.append(nextNode)
+            if (node in extraSuccessors):
+                for nextNode in extraSuccessors[node]:
+                    counts[order[nextNode] - leadingIndex] -= 1
+                    if (counts[order[nextNode] - leadingIndex] == 0):
+                        zeros.append(nextNode)
+        return sortedNodes
+
+    def updateOrder(self, leadingIndex, sortedNodes):
+        position = leadingIndex
+        for node in sortedNodes:
+            self.topoOrder[position] = node
+            self.order[node] = position
+            position += 1
+
+    # Check an execution against the order, re-sorting the invalidated window
+    # Returns {"acyclic": False if cyclic, "leading"/"trailing": re-sorted window (-1 if skipped),
+    #          "unsorted": memOps in (or dependent on) a cyclic dependency}
+    def checkExecution(self, history):
+        order = self.order
+        interEdges = self.getInterEdges(history)
+        leadingIndex = len(self.nodes)
+        trailingIndex = -1
+        for (a, b) in interEdges:
+            if (order[a] > order[b]):
+                if (order[b] < leadingIndex):
+                    leadingIndex = order[b]
+                if (order[a] > trailingIndex):
+                    trailingIndex = order[a]
+        if (trailingIndex == -1):
+            return {"acyclic": True, "leading": -1, "trailing": -1, "unsorted": []}
+        sortedNodes = self.sortWindow(leadingIndex, trailingIndex, interEdges)
+        if (len(sortedNodes) < trailingIndex - leadingIndex + 1):
+            sortedSet = set(sortedNodes)
+            unsortedMemOps = [self.nodes[node] for node in self.topoOrder[leadingIndex:trailingIndex+1] if not node in sortedSet]
+            return {"acyclic": False, "leading": leadingIndex, "trailing": trailingIndex, "unsorted": unsortedMemOps}
+        self.updateOrder(leadingIndex, sortedNodes)
+        return {"acyclic": True, "leading": leadingIndex, "trailing": trailingIndex, "unsorted": []}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Arguments for %s" % __file__)
+    parser.add_argument("--verbose", "-v", action="count", default=0)
+    parser.add_argument("--ignore-reg", action="store_true", default=False)
+    parser.add_argument("--program-file", "-p", help="intermediate file that describes test program and intra-thread dependency", default="prog.txt")
+    parser.add_argument("--wo-file", help="intermediate write-order file name", default="wo.txt")
+    parser.add_argument("--single-copy-atomicity", action="store_true", default=False)
+    parser.add_argument("--order", choices=["index", "greedy", "mst"], help="order of executions to be checked: execution index, or similarity order of unique executions (see exec_order.py)", default="index")
+    parser.add_argument("--span-file", help="re-sort span of each execution (format of tsort.c with RESORT_MEASURE)", default=None)
+    parser.add_argument("inputs", metavar="history files", nargs="+", help="history files to be processed")
+    args = parser.parse_args()
+
+    verbosity = args.verbose
+
+    progModel = parse_prog.parseProgram(args.program_file, args.wo_file, args.ignore_reg, verbosity)
+    hist = parse_hist.parseHistoryFile(args.inputs, verbosity)
+    checker = CollectiveChecker(progModel, args.single_copy_atomicity)
+    numNodes = len(checker.nodes)
+
+    if (args.order == "index"):
+        executionIndices = list(hist.keys())
+        duplicateOf = dict()
+    else:
+        # Unique executions, consecutive ones with low difference (NumPy required)
+        # NOTE: Duplicates have the same verdict as their first-seen execution
+        import exec_order
+        (uniqueIndices, vectors, duplicateOf) = exec_order.getUniqueExecutions(hist)
+        (order, totalDifference) = exec_order.orderBySimilarity(vectors, args.order)
+        executionIndices = [uniqueIndices[i] for i in order]
+        print("INFO: %d unique executions out of %d, total difference %d (%s order)" % (len(uniqueIndices), len(hist), totalDifference, args.order))
+    numDuplicates = dict()
+    for executionIndex in duplicateOf:
+        numDuplicates[duplicateOf[executionIndex]] = numDuplicates.get(duplicateOf[executionIndex], 0) + 1
+
+    if (args.span_file != None):
+        spanFP = open(args.span_file, "w")
+    else:
+        spanFP = None
+    numCyclicExecs = 0
+    numSkippedExecs = 0
+    sumSpans = 0
+    for executionIndex in executionIndices:
+        returnDict = checker.checkExecution(hist[executionIndex])
+        if (returnDict["leading"] == -1):
+            numSkippedExecs += 1
+            spanString = "B,%d,%d,-1,-1" % (executionIndex, numNodes)
+        else:
+            sumSpans += returnDict["trailing"] - returnDict["leading"] + 1
+            spanString = "C,%d,%d,%d,%d" % (executionIndex, numNodes, returnDict["leading"], returnDict["trailing"])
+        if (spanFP != None):
+            spanFP.write("%s\n" % (spanString))
+        if (verbosity > 0):
+            print("Execution %d: %s" % (executionIndex, spanString))
+        if (not returnDict["acyclic"]):
+            numCyclicExecs += 1 + numDuplicates.get(executionIndex, 0)
+            print("Error: Cyclic dependency in execution %d" % (executionIndex))
+            print("Unsorted (%d instructions): %s" % (len(returnDict["unsorted"]), " ".join(["%X" % memOp for memOp in returnDict["unsorted"]])))
+    if (spanFP != None):
+        spanFP.close()
+
+    numResortedExecs = len(executionIndices) - numSkippedExecs
+    if (numResortedExecs > 0):
+        print("INFO: %d executions checked (%d skipped), %.1f out of %d instructions re-sorted on average" % (len(executionIndices), numSkippedExecs, float(sumSpans) / numResortedExecs, numNodes))
+    else:
+        print("INFO: %d executions checked (%d skipped)" % (len(executionIndices), numSkippedExecs))
+    if (numCyclicExecs > 0):
+        print("Error: %d out of %d executions have cyclic dependencies" % (numCyclicExecs, len(hist)))
+        sys.exit(1)
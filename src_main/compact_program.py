@@ -0,0 +1,180 @@
+##########################################################################
+#
+# MTraceCheck
+# Copyright 2017 The Regents of the University of Michigan
+# Doowon Lee and Valeria Bertacco
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+##########################################################################
+
+#
+# Compact (struct-of-arrays) representation of a multi-threaded program
+#
+# NOTE: Instructions are identified by a flat index, assigned thread by
+#       thread in program order, i.e., the flat index of instruction 'inst'
+#       of thread 'thread' is threadStart[thread] + inst.
+#       Use instruction.Instruction for the object-based representation.
+#
+
+import array
+import instruction
+
+class CompactProgram:
+
+    ## Class variables
+    # numThreads: number of threads
+    # numInsts: total number of instructions (across all threads)
+    # threadStart[thread]: flat index of the first instruction of thread (numThreads+1 entries)
+    # threadIndex[flat]: thread index of instruction
+    # instType[flat]: 0 (load), 1 (store), 2 (fence)
+    # address[flat]: 0 -- (numMemLocs-1), -1 if unused (fence parsed from intermediate file)
+    # loadTarget[flat]: 0 -- (numHistRegs-1), -1 if unused (store or fence parsed from intermediate file)
+    # memOp[flat]: memory-operation identifier (see instruction.getMemOp())
+    # intraDepPtr/intraDepIdx: intra-thread dependencies in CSR form
+    #   dependencies of flat are intraDepIdx[intraDepPtr[flat]:intraDepPtr[flat+1]] (flat indices)
+    # reverseDepPtr/reverseDepIdx: reverse intra-thread dependencies in CSR form
+    #   instructions depending on flat, in ascending order (duplicated as in intraDepIdx)
+
+    def __init__(self, numThreads):
+        self.numThreads = numThreads
+        self.numInsts = 0
+        self.threadStart = array.array('l', [0] * (numThreads + 1))
+        self.threadIndex = array.array('l')
+        self.instType = array.array('b')
+        self.address = array.array('l')
+        self.loadTarget = array.array('l')
+        self.memOp = array.array('l')
+        self.intraDepPtr = array.array('l', [0])
+        self.intraDepIdx = array.array('l')
+        self.reverseDepPtr = None
+        self.reverseDepIdx = None
+        self.lastThread = -1
+
+    def addInst(self, thread, instType, address, loadTarget, intraDeps):
+        # NOTE: Instructions should be added thread by thread, in program order
+        #       intraDeps is a list of instruction indices within the thread
+        assert(thread >= self.lastThread and thread < self.numThreads)
+        while (self.lastThread < thread):
+            self.lastThread += 1
+            self.threadStart[self.lastThread] = self.numInsts
+        inst = self.numInsts - self.threadStart[thread]
+        self.threadIndex.append(thread)
+        self.instType.append(instType)
+        self.address.append(address)
+        self.loadTarget.append(loadTarget)
+        self.memOp.append(instruction.getMemOp(thread, inst))
+        for depInst in intraDeps:
+            assert(depInst < inst)
+            self.intraDepIdx.append(self.threadStart[thread] + depInst)
+        self.intraDepPtr.append(len(self.intraDepIdx))
+        self.numInsts += 1
+
+    def finalize(self):
+        while (self.lastThread < self.numThreads):
+            self.lastThread += 1
+            self.threadStart[self.lastThread] = self.numInsts
+        # Construct reverse dependencies (counting sort by dependent instruction)
+        counts = array.array('l', [0] * (self.numInsts + 1))
+        for depFlat in self.intraDepIdx:
+            counts[depFlat+1] += 1
+        for flat in range(self.numInsts):
+            counts[flat+1] += counts[flat]
+        self.reverseDepPtr = array.array('l', counts)
+        self.reverseDepIdx = array.array('l', [0] * len(self.intraDepIdx))
+        for flat in range(self.numInsts):
+            for ptr in range(self.intraDepPtr[flat], self.intraDepPtr[flat+1]):
+                depFlat = self.intraDepIdx[ptr]
+                self.reverseDepIdx[counts[depFlat]] = flat
+                counts[depFlat] += 1
+
+    def getFlatIndex(self, thread, inst):
+        return self.threadStart[thread] + inst
+
+    def getNumThreadInsts(self, thread):
+        return self.threadStart[thread+1] - self.threadStart[thread]
+
+    def getIntraDeps(self, flat):
+        return self.intraDepIdx[self.intraDepPtr[flat]:self.intraDepPtr[flat+1]]
+
+    def getReverseDeps(self, flat):
+        return self.reverseDepIdx[self.reverseDepPtr[flat]:self.reverseDepPtr[flat+1]]
+
+    def getInstruction(self, flat):
+        # Object-based representation of an instruction (for compatibility)
+        inst = instruction.Instruction(self.instType[flat], self.address[flat], self.loadTarget[flat])
+        thread = self.threadIndex[flat]
+        for depFlat in self.getIntraDeps(flat):
+            inst.addIntraDep(instruction.getMemOp(thread, depFlat - self.threadStart[thread]))
+        return inst
+
+    def getInstructions(self):
+        # insts[thread][inst] as created in gen_mtrand.py
+        insts = []
+        for thread in range(self.numThreads):
+            insts.append([self.getInstruction(flat) for flat in range(self.threadStart[thread], self.threadStart[thread+1])])
+        return insts
+
+
+class ExecutionBuffers:
+
+    ## Per-execution state, allocated once and reset by slice assignment
+    # pendingDeps[flat]: number of intra-thread dependencies not yet performed
+    # value[flat]: value that is read in load op (0xffffffff if not performed)
+    # mem[address]: memory contents (memOp of last store, initialized with getMemOp(0xffff, address))
+
+    def __init__(self, compactProg, numMemLocs):
+        self.initPendingDeps = array.array('l', [compactProg.intraDepPtr[flat+1] - compactProg.intraDepPtr[flat] for flat in range(compactProg.numInsts)])
+        self.initValue = array.array('l', [0xffffffff] * compactProg.numInsts)
+        self.initMem = array.array('l', [instruction.getMemOp(0xffff, i) for i in range(numMemLocs)])
+        self.pendingDeps = array.array('l', self.initPendingDeps)
+        self.value = array.array('l', self.initValue)
+        self.mem = array.array('l', self.initMem)
+
+    def reset(self):
+        self.pendingDeps[:] = self.initPendingDeps
+        self.value[:] = self.initValue
+        self.mem[:] = self.initMem
+
+
+def fromInstructions(insts):
+    # insts[thread][inst]: instruction.Instruction objects (see gen_mtrand.py)
+    compactProg = CompactProgram(len(insts))
+    for thread in range(len(insts)):
+        for inst in range(len(insts[thread])):
+            intraDeps = [instruction.getInstIndex(intraDep) for intraDep in insts[thread][inst].intraDeps]
+            compactProg.addInst(thread, insts[thread][inst].instType, insts[thread][inst].address, insts[thread][inst].loadTarget, intraDeps)
+    compactProg.finalize()
+    return compactProg
+
+def fromParsedProgram(prog, intra):
+    # prog and intra are returned by parse_prog.parseProgram() ("progInfo" and "intraDep")
+    # NOTE: Thread and instruction indices should be contiguous from 0
+    assert(sorted(prog.keys()) == list(range(len(prog))))
+    compactProg = CompactProgram(len(prog))
+    for thread in range(len(prog)):
+        assert(sorted(prog[thread].keys()) == list(range(len(prog[thread]))))
+        for inst in range(len(prog[thread])):
+            asm = prog[thread][inst]
+            instType = instruction.getInstType(asm)
+            if (instType == 2):  # fence
+                address = -1
+            else:
+                address = instruction.getAddress(asm)
+            if (instType == 0):  # load, e.g., "ld 0x0,r14"
+                loadTarget = int(asm.split(",")[1][1:])
+            else:
+                loadTarget = -1
+            compactProg.addInst(thread, instType, address, loadTarget, intra[thread][inst])
+    compactProg.finalize()
+    return compactProg
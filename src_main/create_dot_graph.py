@@ -37,6 +37,7 @@ parser.add_argument("--program-file", "-p", help="intermediate file that describ
 parser.add_argument("--wo-file", help="intermediate write-order file name", default="wo.txt")
 parser.add_argument("--gen-png", action="store_true", help="generate PNG files for graphs", default=False)
 parser.add_argument("--gen-tsort", action="store_true", help="generate graph description files for Linux tsort program in Coreutils", default=False)
+parser.add_argument("--tsort-order", choices=["index", "greedy", "mst"], help="order of executions in tsort_list.txt: execution index, or similarity order of unique executions (see exec_order.py)", default="index")
 parser.add_argument("--ignore-reg", action="store_true", default=False)
 parser.add_argument("--no-dot", action="store_true", default=False)
 parser.add_argument("--single-copy-atomicity", action="store_true", default=False)
@@ -55,7 +56,8 @@ else: # Remove "/" at the end of string
 returnDict = parse_prog.parseProgram(args.program_file, args.wo_file, args.ignore_reg, verbosity)
 prog = returnDict["progInfo"]
 intra = returnDict["intraDep"]
-writeOrder = returnDict["writeOrder"]
+nextStore = returnDict["nextStore"]
+firstStore = returnDict["firstStore"]
 lookupInstFromLoad = returnDict["lookupTable"]
 
 hist = parse_hist.parseHistoryFile(args.inputs, verbosity)
@@ -126,11 +128,11 @@ for executionIndex in hist:
                         # Dummy from-reads dependency
                         for frThreadIndex in range(numThreads):
                             if (frThreadIndex == aThreadIndex):  # A thread
-                                if (address in writeOrder[frThreadIndex]):
+                                if (address in firstStore[frThreadIndex]):
                                     tsortFP.write("%s t\n" % \
                                         (instruction.getMemId(bThreadIndex, bInstIndex)))
                             else:  # Threads other than A
-                                if (address in writeOrder[frThreadIndex]):
+                                if (address in firstStore[frThreadIndex]):
                                     tsortFP.write("%s t\n" % \
                                         (instruction.getMemId(bThreadIndex, bInstIndex)))
                     continue
@@ -146,39 +148,37 @@ for executionIndex in hist:
                 ## from-reads dependency: B -> A.[from-reads dependency]
                 if (not args.no_dot):
                     if (aThreadIndex != 0xffff):
-                        if (address in writeOrder[aThreadIndex]):
-                            woIdx = writeOrder[aThreadIndex][address].index(aInstIndex)
-                            if (woIdx < len(writeOrder[aThreadIndex][address])-1):
+                        if (loadValue in nextStore):
+                            if (nextStore[loadValue] != None):
                                 # A is not last store to the address
-                                frInstIndex = writeOrder[aThreadIndex][address][woIdx+1]
+                                frInstIndex = instruction.getInstIndex(nextStore[loadValue])
                                 graphFP.write("%s -> %s [color=\"green\"];\n" % \
                                     (instruction.getMemId(bThreadIndex, bInstIndex), instruction.getMemId(aThreadIndex, frInstIndex)))
                             else:  # A is the last store
                                 pass
                     else:
                         for frThreadIndex in range(numThreads):
-                            if (address in writeOrder[frThreadIndex]):
-                                frInstIndex = writeOrder[frThreadIndex][address][0]
+                            if (address in firstStore[frThreadIndex]):
+                                frInstIndex = instruction.getInstIndex(firstStore[frThreadIndex][address])
                                 graphFP.write("%s -> %s [color=\"green\"];\n" % \
                                     (instruction.getMemId(bThreadIndex, bInstIndex), instruction.getMemId(frThreadIndex, frInstIndex)))
                 if (tsortFP != None):
                     for frThreadIndex in range(numThreads):
                         if (frThreadIndex == aThreadIndex):  # A thread
-                            if (address in writeOrder[frThreadIndex]):
-                                woIdx = writeOrder[frThreadIndex][address].index(aInstIndex)
-                                if (woIdx < len(writeOrder[frThreadIndex][address])-1):  # A is not last store to the address
-                                    frInstIndex = writeOrder[aThreadIndex][address][woIdx+1]
+                            if (loadValue in nextStore):
+                                if (nextStore[loadValue] != None):  # A is not last store to the address
+                                    frInstIndex = instruction.getInstIndex(nextStore[loadValue])
                                     tsortFP.write("%s %s\n" % \
                                         (instruction.getMemId(bThreadIndex, bInstIndex), instruction.getMemId(frThreadIndex, frInstIndex)))
                                 else:  # A is the last store
                                     tsortFP.write("%s t\n" % \
                                         (instruction.getMemId(bThreadIndex, bInstIndex)))
                         else:  # Threads other than A
-                            if (address in writeOrder[frThreadIndex]):
+                            if (address in firstStore[frThreadIndex]):
                                 if (aThreadIndex == 0xffff):
                                     tsortFP.write("%s %s\n" % \
                                         (instruction.getMemId(bThreadIndex, bInstIndex), \
-                                        (instruction.getMemId(frThreadIndex, writeOrder[frThreadIndex][address][0]))))
+                                        (instruction.getMemId(frThreadIndex, instruction.getInstIndex(firstStore[frThreadIndex][address])))))
                                 else:
                                     tsortFP.write("%s t\n" % \
                                         (instruction.getMemId(bThreadIndex, bInstIndex)))
@@ -199,8 +199,18 @@ for executionIndex in hist:
         os.system("neato -n -Tpng %s/graph%d.dot -o%s/graph%d.png" % (outDirPrefix, executionIndex, outDirPrefix, executionIndex))
 
 if (args.gen_tsort):
+    if (args.tsort_order == "index"):
+        tsortExecutionIndices = list(hist.keys())
+    else:
+        # Unique executions, consecutive ones with low difference (NumPy required)
+        import exec_order
+        (uniqueIndices, vectors, duplicateOf) = exec_order.getUniqueExecutions(hist)
+        (order, totalDifference) = exec_order.orderBySimilarity(vectors, args.tsort_order)
+        tsortExecutionIndices = [uniqueIndices[i] for i in order]
+        if (verbosity > 0):
+            print("INFO: %d unique executions out of %d, total difference %d (%s order)" % (len(uniqueIndices), len(hist), totalDifference, args.tsort_order))
     tsortListFP = open("%s/tsort_list.txt" % (outDirPrefix), "w")
-    for executionIndex in hist:
+    for executionIndex in tsortExecutionIndices:
         tsortListFP.write("%s/tsort%d.txt\n" % (outDirPrefix, executionIndex))
     tsortListFP.close()
 
@@ -23,10 +23,10 @@
 import os
 import sys
 import argparse
+import multiprocessing
 import instruction
 import parse_prog
 import parse_hist
-import copy
 
 parser = argparse.ArgumentParser(description="Arguments for %s" % __file__)
 parser.add_argument("--verbose", "-v", action="count", default=0)
@@ -35,78 +35,320 @@ parser.add_argument("--ignore-reg", action="store_true", default=False)
 parser.add_argument("--program-file", "-p", help="intermediate file that describes test program and intra-thread dependency", default="prog.txt")
 parser.add_argument("--wo-file", help="intermediate write-order file name", default="wo.txt")
 parser.add_argument("--single-copy-atomicity", action="store_true", default=False)
+parser.add_argument("--check-mode", choices=["closure", "kahn", "dynamic"], help="closure: transitive closure of dependencies, stop at the first cyclic execution; kahn: topological sort only (no closure), report strongly connected components of every cyclic execution; dynamic: maintain a topological order across executions (Pearce-Kelly), report a cycle of every cyclic execution", default="closure")
+parser.add_argument("--jobs", "-j", type=int, help="number of worker processes checking executions in parallel", default=1)
+parser.add_argument("--models", help="comma-separated consistency models (e.g., sc,tso,wo): check every execution against each model in a single pass (intra-thread dependencies in the program file are replaced by those of each model)", default=None)
+parser.add_argument("--verdict-file", help="verdict file of --models (verdict of each model for each execution, 1 if allowed)", default="verdict.csv")
 parser.add_argument("inputs", metavar="history files", nargs="+", help="history files to be processed")
 args = parser.parse_args()
 
 verbosity = args.verbose
+if (args.jobs < 1):
+    print("Error: Number of jobs should be positive (%d)" % args.jobs)
+    sys.exit(1)
+
+# Consistency models (--models)
+if (args.models != None):
+    import gen_mtrand
+    models = args.models.split(",")
+    if (len(set(models)) != len(models)):
+        print("Error: Duplicated consistency models %s" % (args.models))
+        sys.exit(1)
+    modelRules = [gen_mtrand.getOrderingRules(model) for model in models]
+else:
+    models = None
 
 ############################################################
 ## Set dependency propagation
 ############################################################
 
-# TODO: algorithmic improvement
-def setDependencyPropagation(depSet):
-    # Convert the set into a flat set
-    flatSet = dict() # a dict which uses thread+inst as index
+# NOTE: Instructions are assigned dense node indices (see getDenseNodes()),
+#       and the set of instructions that a node depends on (transitively) is
+#       a bitset (Python integer, bit i for node i). Nodes are visited in
+#       topological order (Kahn's algorithm), so that the bitset of a node is
+#       the union (OR) of bitsets of its direct dependencies, computed once.
+
+# Dense node indices of instructions in depSet[thread][inst]
+# Returns (nodes, nodeIndex): nodes[i] is memOp of node i, nodeIndex[memOp] = i
+def getDenseNodes(depSet):
+    nodes = []
+    nodeIndex = dict()
     for thread in depSet:
         for inst in depSet[thread]:
             memIndex = instruction.getMemOp(thread, inst)
-            flatSet[memIndex] = set(depSet[thread][inst])
+            nodeIndex[memIndex] = len(nodes)
+            nodes.append(memIndex)
+    return (nodes, nodeIndex)
 
-    numInsts = len(flatSet)
-    visited = dict()
-    for memIndex in flatSet:
-        visited[memIndex] = False
+# Transitive closure of dependencies
+# depLists[i]: nodes that node i directly depends on
+# Returns (reachBits, visited)
+#   reachBits[i]: bitset of nodes that node i depends on (directly or transitively), None if cyclic
+#   visited[i]: False if node i is in (or depends on) a cyclic dependency
+def propagateDependencyBits(depLists):
+    numNodes = len(depLists)
+    dependents = [[] for i in range(numNodes)]
+    numPendingDeps = [0] * numNodes
+    for node in range(numNodes):
+        for depNode in depLists[node]:
+            dependents[depNode].append(node)
+        numPendingDeps[node] = len(depLists[node])
+    nodeBits = [1 << node for node in range(numNodes)]
+    reachBits = [0] * numNodes
+    visited = [False] * numNodes
     visitedCount = 0
-    readyList = []
-    while True:
-        #print("readyList %s" % readyList)
-        if (len(readyList) == 0):
-            # Add instructions with no unvisited dependent instructions
-            for memIndex in flatSet:
-                if (not visited[memIndex]):
-                    ready = True
-                    for depMemIndex in flatSet[memIndex]:
-                        if not visited[depMemIndex]:
-                            ready = False
-                            break
-                    if ready:
-                        readyList.append(memIndex)
-            # Check if there is no added instruction
-            if (len(readyList) == 0):
-                if (visitedCount == numInsts):
-                    # All instructions in the thread are propagated
-                    break
-                else:
-                    # There is unvisited instruction(s)
-                    print("Error: Cyclic dependency")
-                    print("numInsts %d visitedCount %d" % (numInsts, visitedCount))
-                    print("visited %s" % visited)
-                    for memIndex in flatSet:
-                        if (not visited[memIndex]):
-                            sys.stdout.write("%X:" % memIndex)
-                            for depMemIndex in flatSet[memIndex]:
-                                #sys.stdout.write(" %X" % depMemIndex)
-                                if (not visited[depMemIndex]):
-                                    sys.stdout.write(" %X" % depMemIndex)
-                            sys.stdout.write("\n")
-                    sys.exit(1)
+    readyList = [node for node in range(numNodes) if numPendingDeps[node] == 0]
+    while (len(readyList) > 0):
+        node = readyList.pop()
+        visited[node] = True
+        visitedCount += 1
+        bits = 0
+        for depNode in depLists[node]:
+            bits |= reachBits[depNode] | nodeBits[depNode]
+        reachBits[node] = bits
+        for nextNode in dependents[node]:
+            numPendingDeps[nextNode] -= 1
+            if (numPendingDeps[nextNode] == 0):
+                readyList.append(nextNode)
+    if (visitedCount < numNodes):
+        return (None, visited)
+    return (reachBits, visited)
+
+# Reverse dependencies (dependents[i]: nodes that directly depend on node i)
+def getDependents(depLists):
+    dependents = [[] for i in range(len(depLists))]
+    for node in range(len(depLists)):
+        for depNode in depLists[node]:
+            dependents[depNode].append(node)
+    return dependents
+
+# Check for a cyclic dependency (Kahn's algorithm, without closure)
+# depLists, dependents: static dependencies (e.g., intra-thread) and their reverse (see getDependents())
+# extraEdges: list of (node, depNode), node depends on depNode in addition to static dependencies
+# Returns True if there is no cyclic dependency
+def isAcyclic(depLists, dependents, extraEdges):
+    numNodes = len(depLists)
+    numPendingDeps = [len(depNodes) for depNodes in depLists]
+    extraDependents = dict()
+    for (node, depNode) in extraEdges:
+        numPendingDeps[node] += 1
+        if (depNode in extraDependents):
+            extraDependents[depNode].append(node)
         else:
-            visitMemIndex = readyList.pop(0)
-            visited[visitMemIndex] = True
-            visitedCount += 1
-            #print("picked visitMemIndex %X" % visitMemIndex)
-            #print("dependency %s" % flatSet[visitMemIndex])
-            addedSet = set()
-            for depMemIndex in flatSet[visitMemIndex]:
-                addedSet |= flatSet[depMemIndex]
-            flatSet[visitMemIndex] |= addedSet
-
-    # Convert back the flat set to the original hierarchical data structure
-    for memIndex in flatSet:
-        thread = instruction.getThreadIndex(memIndex)
-        inst = instruction.getInstIndex(memIndex)
-        depSet[thread][inst] = flatSet[memIndex]
+            extraDependents[depNode] = [node]
+    readyList = [node for node in range(numNodes) if numPendingDeps[node] == 0]
+    visitedCount = 0
+    while (len(readyList) > 0):
+        node = readyList.pop()
+        visitedCount += 1
+        for nextNode in dependents[node]:
+            numPendingDeps[nextNode] -= 1
+            if (numPendingDeps[nextNode] == 0):
+                readyList.append(nextNode)
+        if (node in extraDependents):
+            for nextNode in extraDependents[node]:
+                numPendingDeps[nextNode] -= 1
+                if (numPendingDeps[nextNode] == 0):
+                    readyList.append(nextNode)
+    return (visitedCount == numNodes)
+
+# Strongly connected components in cyclic dependencies (Tarjan's algorithm, iterative)
+# Returns list of components (sorted node lists) with more than one node or a self dependency
+def findCyclicComponents(depLists):
+    numNodes = len(depLists)
+    index = [-1] * numNodes
+    lowLink = [0] * numNodes
+    onStack = [False] * numNodes
+    stack = []
+    components = []
+    nextIndex = 0
+    for root in range(numNodes):
+        if (index[root] != -1):
+            continue
+        index[root] = nextIndex
+        lowLink[root] = nextIndex
+        nextIndex += 1
+        stack.append(root)
+        onStack[root] = True
+        workStack = [[root, 0]]  # [node, next dependency to be visited]
+        while (len(workStack) > 0):
+            work = workStack[-1]
+            node = work[0]
+            if (work[1] < len(depLists[node])):
+                depNode = depLists[node][work[1]]
+                work[1] += 1
+                if (index[depNode] == -1):
+                    index[depNode] = nextIndex
+                    lowLink[depNode] = nextIndex
+                    nextIndex += 1
+                    stack.append(depNode)
+                    onStack[depNode] = True
+                    workStack.append([depNode, 0])
+                elif (onStack[depNode] and index[depNode] < lowLink[node]):
+                    lowLink[node] = index[depNode]
+            else:
+                workStack.pop()
+                if (len(workStack) > 0):
+                    parent = workStack[-1][0]
+                    if (lowLink[node] < lowLink[parent]):
+                        lowLink[parent] = lowLink[node]
+                if (lowLink[node] == index[node]):
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        onStack[member] = False
+                        component.append(member)
+                        if (member == node):
+                            break
+                    if (len(component) > 1 or node in depLists[node]):
+                        components.append(sorted(component))
+    return components
+
+# Dynamic topological order (Pearce-Kelly algorithm)
+# NOTE: The order is a topological order of static dependencies, and extra
+#       dependencies of an execution are inserted one by one. If an inserted
+#       dependency is inconsistent with the order, only the affected region
+#       (nodes between the two end nodes in the order, reachable from/to them)
+#       is searched and reordered, and a cycle is found if the region closes it.
+#       Extra dependencies are removed after the execution is checked, which
+#       keeps the order valid, so that the next execution starts from the order
+#       of the previous one.
+class DynamicOrder:
+
+    ## Class variables
+    # depLists[i], dependents[i]: static dependencies of node i (see getDependents())
+    # extraDepLists[i], extraDependents[i]: inserted dependencies (dictionaries of lists)
+    # order[i]: position of node i in the order, nodeAt[position]: node at position
+
+    def __init__(self, depLists, dependents):
+        numNodes = len(depLists)
+        self.depLists = depLists
+        self.dependents = dependents
+        self.extraDepLists = dict()
+        self.extraDependents = dict()
+        self.order = [-1] * numNodes
+        self.nodeAt = []
+        numPendingDeps = [len(depNodes) for depNodes in depLists]
+        readyList = [node for node in range(numNodes) if numPendingDeps[node] == 0]
+        while (len(readyList) > 0):
+            node = readyList.pop()
+            self.order[node] = len(self.nodeAt)
+            self.nodeAt.append(node)
+            for nextNode in dependents[node]:
+                numPendingDeps[nextNode] -= 1
+                if (numPendingDeps[nextNode] == 0):
+                    readyList.append(nextNode)
+        assert(len(self.nodeAt) == numNodes)
+
+    # Insert a dependency (node depends on depNode)
+    # Returns None, or a cycle closed by this dependency (list of nodes, each depending on the previous one)
+    def insertEdge(self, node, depNode):
+        order = self.order
+        lowerBound = order[node]
+        upperBound = order[depNode]
+        if (lowerBound <= upperBound):
+            if (lowerBound == upperBound):
+                return [node]
+            ## Affected region 1: nodes depending on node, up to depNode in the order
+            parent = {node: None}
+            stack = [node]
+            while (len(stack) > 0):
+                currNode = stack.pop()
+                for nextNode in self.dependents[currNode] + self.extraDependents.get(currNode, []):
+                    if (nextNode == depNode):
+                        cycle = [depNode]
+                        while (currNode != None):
+                            cycle.append(currNode)
+                            currNode = parent[currNode]
+                        cycle.reverse()
+                        return cycle
+                    if (order[nextNode] < upperBound and not nextNode in parent):
+                        parent[nextNode] = currNode
+                        stack.append(nextNode)
+            forwardNodes = list(parent.keys())
+            ## Affected region 2: nodes that depNode depends on, down to node in the order
+            visited = set([depNode])
+            stack = [depNode]
+            while (len(stack) > 0):
+                currNode = stack.pop()
+                for prevNode in self.depLists[currNode] + self.extraDepLists.get(currNode, []):
+                    if (order[prevNode] > lowerBound and not prevNode in visited):
+                        visited.add(prevNode)
+                        stack.append(prevNode)
+            backwardNodes = list(visited)
+            ## Reorder: region 2 followed by region 1, in the positions of both regions
+            forwardNodes.sort(key=lambda n: order[n])
+            backwardNodes.sort(key=lambda n: order[n])
+            positions = sorted([order[n] for n in forwardNodes] + [order[n] for n in backwardNodes])
+            for (position, regionNode) in zip(positions, backwardNodes + forwardNodes):
+                order[regionNode] = position
+                self.nodeAt[position] = regionNode
+        self.extraDepLists.setdefault(node, []).append(depNode)
+        self.extraDependents.setdefault(depNode, []).append(node)
+        return None
+
+    # Check for a cyclic dependency with extra dependencies (list of (node, depNode))
+    # Returns None, or the first cycle found (see insertEdge())
+    def findCycle(self, extraEdges):
+        order = self.order
+        extraDepLists = self.extraDepLists
+        extraDependents = self.extraDependents
+        cycle = None
+        for (node, depNode) in extraEdges:
+            if (order[depNode] < order[node]):
+                # Consistent with the order (same as insertEdge(), without search)
+                extraDepLists.setdefault(node, []).append(depNode)
+                extraDependents.setdefault(depNode, []).append(node)
+                continue
+            cycle = self.insertEdge(node, depNode)
+            if (cycle != None):
+                break
+        self.extraDepLists.clear()
+        self.extraDependents.clear()
+        return cycle
+
+# Set of memOps in a bitset
+def getMemOpSet(nodes, bits):
+    memOpSet = set()
+    node = 0
+    while (bits != 0):
+        if (bits & 1):
+            memOpSet.add(nodes[node])
+        bits >>= 1
+        node += 1
+    return memOpSet
+
+# Print instructions in a cyclic dependency, and exit
+# depMemOpSets[i]: set of memOps that node i depends on
+def reportCyclicDependency(nodes, depMemOpSets, visited):
+    visitedDict = dict()
+    for node in range(len(nodes)):
+        visitedDict[nodes[node]] = visited[node]
+    print("Error: Cyclic dependency")
+    print("numInsts %d visitedCount %d" % (len(nodes), visited.count(True)))
+    print("visited %s" % visitedDict)
+    for node in range(len(nodes)):
+        if (not visited[node]):
+            sys.stdout.write("%X:" % nodes[node])
+            for depMemIndex in depMemOpSets[node]:
+                if (not visitedDict[depMemIndex]):
+                    sys.stdout.write(" %X" % depMemIndex)
+            sys.stdout.write("\n")
+    sys.exit(1)
+
+def setDependencyPropagation(depSet):
+    (nodes, nodeIndex) = getDenseNodes(depSet)
+    depMemOpSets = [set(depSet[instruction.getThreadIndex(memIndex)][instruction.getInstIndex(memIndex)]) for memIndex in nodes]
+    depLists = [[nodeIndex[depMemIndex] for depMemIndex in depMemOpSets[node]] for node in range(len(nodes))]
+    (reachBits, visited) = propagateDependencyBits(depLists)
+    if (reachBits == None):
+        reportCyclicDependency(nodes, depMemOpSets, visited)
+
+    # Convert back the bitsets to the original hierarchical data structure
+    for node in range(len(nodes)):
+        thread = instruction.getThreadIndex(nodes[node])
+        inst = instruction.getInstIndex(nodes[node])
+        depSet[thread][inst] = getMemOpSet(nodes, reachBits[node])
 
     return depSet
 
@@ -117,10 +359,13 @@ def setDependencyPropagation(depSet):
 if (verbosity > 0):
     print("INFO: Reading a testcase description %s" % (args.program_file))
 
-returnDict = parse_prog.parseProgram(args.program_file, args.wo_file, args.ignore_reg, verbosity)
+# NOTE: Write order of --models is not read from the write-order file (see below)
+returnDict = parse_prog.parseProgram(args.program_file, args.wo_file if models == None else None, args.ignore_reg, verbosity)
 prog = returnDict["progInfo"]
 intra = returnDict["intraDep"]
 writeOrder = returnDict["writeOrder"]
+nextStore = returnDict["nextStore"]
+firstStore = returnDict["firstStore"]
 lookupInstFromLoad = returnDict["lookupTable"]
 
 #print("DEBUG: writeOrder %s" % writeOrder)
@@ -168,35 +413,49 @@ if (verbosity > 1):
             print("Instruction %d: %s" % (inst, intraSet[thread][inst]))
 
 # dependency propagation
-intraSet = setDependencyPropagation(intraSet)
+# NOTE: Intra-thread dependencies are kept as dense node indices (intraDepLists),
+#       and their closure (intraReachBits) is used only for reporting, because
+#       closure of (intra + inter) is the same as closure of (closed intra + inter).
+#       Both are computed once, and shared (not copied) by all executions:
+#       each execution is checked with its inter-thread dependencies on top
+#       (see isAcyclic()), and the entire graph of an execution is built only
+#       for reporting (cyclic execution, or verbose output).
+#       Only inter-thread dependencies are allocated per execution, but the check
+#       itself still sorts all nodes (O(nodes + dependencies) per execution).
+#       A search restricted to inter-thread dependencies (on the closure, or on
+#       a static order) is not used: nearly every memory operation is an end of
+#       an inter-thread dependency in random tests, so it is not cheaper.
+(nodes, nodeIndex) = getDenseNodes(intraSet)
+intraDepLists = [[nodeIndex[depMemIndex] for depMemIndex in intraSet[instruction.getThreadIndex(memIndex)][instruction.getInstIndex(memIndex)]] for memIndex in nodes]
+(intraReachBits, visited) = propagateDependencyBits(intraDepLists)
+if (intraReachBits == None):
+    reportCyclicDependency(nodes, [intraSet[instruction.getThreadIndex(memIndex)][instruction.getInstIndex(memIndex)] for memIndex in nodes], visited)
+
+intraDependents = getDependents(intraDepLists)
 
 if (verbosity > 1):
     print("### Intra-thread dependencies propagated")
     for thread in intraSet:
         print("Thread %d" % (thread))
         for inst in intraSet[thread]:
-            print("Instruction %d: %s" % (inst, intraSet[thread][inst]))
+            print("Instruction %d: %s" % (inst, getMemOpSet(nodes, intraReachBits[nodeIndex[instruction.getMemOp(thread, inst)]])))
 
 ## 2. Inter-thread dependency list
-for executionIndex in hist:
-    if (verbosity > 0):
-        print("%s: Cycle-checking execution %d" % (__file__, executionIndex))
-    # Copy intraSet to combinedSet
-    combinedSet = dict()
-    for thread in intraSet:
-        combinedSet[thread] = dict()
-        for inst in intraSet[thread]:
-            combinedSet[thread][inst] = set()
-            for depInst in intraSet[thread][inst]:
-                #print("debug: thread %d depInst %d" % (thread, depInst))
-                combinedSet[thread][inst].add(depInst)
+# Addresses of load instructions (addressOf[thread][inst])
+addressOf = dict()
+for thread in prog:
+    addressOf[thread] = dict()
+    for inst in prog[thread]:
+        if (instruction.getInstType(prog[thread][inst]) == 0):  # load
+            addressOf[thread][inst] = instruction.getAddress(prog[thread][inst])
 
-    if (verbosity > 1):
-        print("### Inter dependencies before propagation")
-        for thread in hist[executionIndex]:
-            print("Thread %d: %s" % (thread, hist[executionIndex][thread]))
-
-    # Add inter-thread dependencies
+# Inter-thread dependencies of an execution: list of (node, depNode), node depends on depNode
+# frEdges: if a list is given, from-reads dependencies are appended to it (not to the returned list)
+def getInterEdges(executionIndex, frEdges=None):
+    if (frEdges == None):
+        frEdges = interEdges = []
+    else:
+        interEdges = []
     for thread in hist[executionIndex]:
         for registerIndex in hist[executionIndex][thread]:
             for loadIndex in range(len(hist[executionIndex][thread][registerIndex])):
@@ -204,48 +463,223 @@ for executionIndex in hist:
                 loadValue = hist[executionIndex][thread][registerIndex][loadIndex]
                 instIndex = lookupInstFromLoad[thread][registerIndex][loadIndex]
                 aThreadIndex = instruction.getThreadIndex(loadValue)
-                aInstIndex = instruction.getInstIndex(loadValue)
                 if (not args.single_copy_atomicity and aThreadIndex == thread):
                     # Load value is from a store in the same thread
                     # This dependency is ignored in multiple-copy atomicity...
                     continue
+                loadMemOp = instruction.getMemOp(thread, instIndex)
+                loadNode = nodeIndex[loadMemOp]
                 # Reads-from dependency
                 if (aThreadIndex != 0xffff):
                     # find which load instruction corresponds to this load index
                     assert(loadIndex < len(lookupInstFromLoad[thread][registerIndex]))
-                    combinedSet[thread][instIndex].add(loadValue)  # NOTE: loadValue should be generated via getMemOp()
+                    interEdges.append((loadNode, nodeIndex[loadValue]))  # NOTE: loadValue should be generated via getMemOp()
                     #print("inter-dependency added: thread %d inst %d -> load value %X" % (thread, instIndex, loadValue));
                 # From-reads dependency (see create_dot_graph.py for similar code)
-                address = instruction.getAddress(prog[thread][instIndex])
-                loadMemOp = instruction.getMemOp(thread, instIndex)
+                address = addressOf[thread][instIndex]
                 if (aThreadIndex != 0xffff):
-                    if (address in writeOrder[aThreadIndex]):
-                        woIdx = writeOrder[aThreadIndex][address].index(aInstIndex)
-                        if (woIdx < len(writeOrder[aThreadIndex][address])-1):
+                    if (loadValue in nextStore):
+                        frMemOp = nextStore[loadValue]
+                        if (frMemOp != None):
                             # A is not last store to the address
-                            frInstIndex = writeOrder[aThreadIndex][address][woIdx+1]
-                            combinedSet[aThreadIndex][frInstIndex].add(loadMemOp)
-                            #print("frDep: %X -> %X -> %X" % (loadValue, loadMemOp, instruction.getMemOp(aThreadIndex, frInstIndex)))
+                            frEdges.append((nodeIndex[frMemOp], loadNode))
+                            #print("frDep: %X -> %X -> %X" % (loadValue, loadMemOp, frMemOp))
                         else:  # A is the last store
                             pass
                 else:
-                    for frThreadIndex in combinedSet:
-                        if (address in writeOrder[frThreadIndex]):
-                            frInstIndex = writeOrder[frThreadIndex][address][0]
-                            combinedSet[frThreadIndex][frInstIndex].add(loadMemOp)
-                            #print("frDep: %X -> %X -> %X" % (loadValue, loadMemOp, instruction.getMemOp(frThreadIndex, frInstIndex)))
+                    for frThreadIndex in intraSet:
+                        if (address in firstStore[frThreadIndex]):
+                            frMemOp = firstStore[frThreadIndex][address]
+                            frEdges.append((nodeIndex[frMemOp], loadNode))
+                            #print("frDep: %X -> %X -> %X" % (loadValue, loadMemOp, frMemOp))
+    return interEdges
+
+## 3. Intra-thread dependency lists of consistency models (--models)
+# NOTE: Intra-thread dependencies of each model are created from the program
+#       (see addIntraDependencies() in gen_mtrand.py). Inter-thread dependencies
+#       of an execution are created once, and shared by all models: reads-from
+#       dependencies for every model, and from-reads dependencies for models
+#       ordering stores, which have the write order of gen_mtrand.py (stores to
+#       an address in program order of each thread, see writeProgramFiles()).
+#       Dependencies of a model are a subset of those of another model whose
+#       ordering rules are all the same or stronger, so that an execution
+#       allowed in a model is allowed in weaker models, and one not allowed
+#       in a model is not allowed in stronger models. Models are checked from
+#       the strongest (the most ordering rules), skipping implied verdicts.
+if (models != None):
+    for thread in range(len(prog)):
+        if (not thread in prog):
+            print("Error: Thread %d is not found in %s" % (thread, args.program_file))
+            sys.exit(1)
+    programInsts = []
+    for thread in range(len(prog)):
+        programInsts.append([])
+        for inst in sorted(prog[thread].keys()):
+            if (inst != len(programInsts[thread])):
+                print("Error: Instruction %d/%d is not found in %s" % (thread, len(programInsts[thread]), args.program_file))
+                sys.exit(1)
+            instType = instruction.getInstType(prog[thread][inst])
+            if (instType == 2):  # fence
+                programInsts[thread].append(instruction.Instruction(instType))
+            else:
+                programInsts[thread].append(instruction.Instruction(instType, instruction.getAddress(prog[thread][inst])))
+
+    modelDepLists = []
+    modelDependents = []
+    for model in models:
+        for thread in range(len(programInsts)):
+            for inst in range(len(programInsts[thread])):
+                del programInsts[thread][inst].intraDeps[:]
+        gen_mtrand.addIntraDependencies(programInsts, model, args.single_copy_atomicity)
+        depLists = [[nodeIndex[depMemIndex] for depMemIndex in programInsts[instruction.getThreadIndex(memIndex)][instruction.getInstIndex(memIndex)].intraDeps] for memIndex in nodes]
+        modelDepLists.append(depLists)
+        modelDependents.append(getDependents(depLists))
+
+    writeOrder = dict()
+    for thread in range(len(programInsts)):
+        writeOrder[thread] = dict()
+        for inst in range(len(programInsts[thread])):
+            if (programInsts[thread][inst].instType == 1):  # store
+                address = programInsts[thread][inst].address
+                if (not address in writeOrder[thread]):
+                    writeOrder[thread][address] = [inst]
+                else:
+                    writeOrder[thread][address].append(inst)
+    (nextStore, firstStore) = parse_prog.getWriteOrderSuccessors(writeOrder)
+
+    # isWeakerModel[i][j]: True if every ordering rule of model i is also a rule of model j
+    isWeakerModel = [[all([(not ruleI) or ruleJ for (ruleI, ruleJ) in zip(modelRules[i], modelRules[j])]) for j in range(len(models))] for i in range(len(models))]
+    modelCheckOrder = sorted(range(len(models)), key=lambda i: -sum(modelRules[i]))
+
+# Verdicts of an execution in consistency models (--models)
+# Returns a tuple of verdicts (True if allowed) in the order of models
+def checkModels(executionIndex):
+    frEdges = []
+    rfEdges = getInterEdges(executionIndex, frEdges)
+    verdicts = [None] * len(models)
+    for i in modelCheckOrder:
+        for j in range(len(models)):
+            if (verdicts[j] == True and isWeakerModel[i][j]):
+                verdicts[i] = True
+                break
+            if (verdicts[j] == False and isWeakerModel[j][i]):
+                verdicts[i] = False
+                break
+        if (verdicts[i] == None):
+            # From-reads dependencies are created with the write order, defined if stores are ordered
+            if (modelRules[i][3]):
+                verdicts[i] = isAcyclic(modelDepLists[i], modelDependents[i], rfEdges + frEdges)
+            else:
+                verdicts[i] = isAcyclic(modelDepLists[i], modelDependents[i], rfEdges)
+    return tuple(verdicts)
+
+# Check an execution for a cyclic dependency (see isAcyclic())
+# NOTE: This function is also called in worker processes (see --jobs)
+def checkExecution(executionIndex):
+    if (models != None):
+        return (executionIndex, checkModels(executionIndex))
+    if (args.check_mode == "dynamic"):
+        return (executionIndex, dynamicOrder.findCycle(getInterEdges(executionIndex)) == None)
+    return (executionIndex, isAcyclic(intraDepLists, intraDependents, getInterEdges(executionIndex)))
+
+# Topological order maintained across executions (--check-mode=dynamic)
+# NOTE: Each worker process (see --jobs) maintains its own order
+if (args.check_mode == "dynamic"):
+    dynamicOrder = DynamicOrder(intraDepLists, intraDependents)
+
+executionIndices = list(hist.keys())
+if (args.jobs > 1):
+    # Worker processes are forked after the program and histories are parsed, so that
+    # they share them. Only execution indices and verdicts are passed, in execution order.
+    pool = multiprocessing.Pool(args.jobs)
+    chunkSize = max(1, min(64, len(executionIndices) // (args.jobs * 4)))
+    verdicts = pool.imap(checkExecution, executionIndices, chunkSize)
+else:
+    pool = None
+    verdicts = (checkExecution(executionIndex) for executionIndex in executionIndices)
+
+numCyclicExecs = 0
+if (models != None):
+    verdictFP = open(args.verdict_file, "w")
+    verdictFP.write("execution,%s\n" % (",".join(models)))
+    numAllowedExecs = [0] * len(models)
+for (executionIndex, acyclic) in verdicts:
+    if (verbosity > 0):
+        print("%s: Cycle-checking execution %d" % (__file__, executionIndex))
+    # Verdict vector of consistency models (--models)
+    if (models != None):
+        verdictFP.write("%d,%s\n" % (executionIndex, ",".join(["1" if allowed else "0" for allowed in acyclic])))
+        for i in range(len(models)):
+            if (acyclic[i]):
+                numAllowedExecs[i] += 1
+        continue
+    # NOTE: The entire graph of an execution is built only for reporting
+    if (acyclic and verbosity < 2):
+        continue
+
+    if (verbosity > 1):
+        print("### Inter dependencies before propagation")
+        for thread in hist[executionIndex]:
+            print("Thread %d: %s" % (thread, hist[executionIndex][thread]))
+
+    interEdges = getInterEdges(executionIndex)
+
+    # Dynamic topological order (--check-mode=dynamic)
+    if (args.check_mode == "dynamic"):
+        if (not acyclic):
+            numCyclicExecs += 1
+            cycle = dynamicOrder.findCycle(interEdges)
+            print("Error: Cyclic dependency in execution %d" % (executionIndex))
+            print("Cycle (%d instructions): %s" % (len(cycle), " ".join(["%X" % nodes[node] for node in cycle])))
+        continue
+
+    # Topological sort only (--check-mode=kahn)
+    # NOTE: Strongly connected components are searched only for cyclic executions
+    if (args.check_mode == "kahn"):
+        if (not acyclic):
+            numCyclicExecs += 1
+            combinedDepLists = [list(depNodes) for depNodes in intraDepLists]
+            for (node, depNode) in interEdges:
+                combinedDepLists[node].append(depNode)
+            print("Error: Cyclic dependency in execution %d" % (executionIndex))
+            for component in findCyclicComponents(combinedDepLists):
+                print("SCC (%d instructions): %s" % (len(component), " ".join(["%X" % nodes[node] for node in component])))
+        continue
 
     # dependency propagation
-    combinedSet = setDependencyPropagation(combinedSet)
+    combinedDepLists = [list(depNodes) for depNodes in intraDepLists]
+    for (node, depNode) in interEdges:
+        combinedDepLists[node].append(depNode)
+    (reachBits, visited) = propagateDependencyBits(combinedDepLists)
+    if (reachBits == None):
+        # Dependencies of a node: closed intra-thread dependencies, followed by inter-thread dependencies
+        depMemOpSets = []
+        for node in range(len(nodes)):
+            depMemOpSet = getMemOpSet(nodes, intraReachBits[node])
+            for depNode in combinedDepLists[node][len(intraDepLists[node]):]:
+                depMemOpSet.add(nodes[depNode])
+            depMemOpSets.append(depMemOpSet)
+        reportCyclicDependency(nodes, depMemOpSets, visited)
 
     if (verbosity > 1):
         print("### Inter+Intra dependencies propagated")
-        for thread in combinedSet:
+        for thread in intraSet:
             print("Thread %d" % (thread))
-            for inst in combinedSet[thread]:
-                print("Instruction %d: %s" % (inst, combinedSet[thread][inst]))
+            for inst in intraSet[thread]:
+                print("Instruction %d: %s" % (inst, getMemOpSet(nodes, reachBits[nodeIndex[instruction.getMemOp(thread, inst)]])))
 
     # debug
     #sys.exit(0)
 
+if (pool != None):
+    pool.close()
+    pool.join()
+
+if (models != None):
+    verdictFP.close()
+    for i in range(len(models)):
+        print("INFO: Model %s: %d out of %d executions allowed" % (models[i], numAllowedExecs[i], len(hist)))
 
+if (numCyclicExecs > 0):
+    print("Error: %d out of %d executions have cyclic dependencies" % (numCyclicExecs, len(hist)))
+    sys.exit(1)
@@ -0,0 +1,134 @@
+##########################################################################
+#
+# MTraceCheck
+# Copyright 2017 The Regents of the University of Michigan
+# Doowon Lee and Valeria Bertacco
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+##########################################################################
+
+#
+# Similarity ordering of executions for collective checking (NumPy required)
+#
+# NOTE: Collective checking (collective_checker.py, src_tsort/tsort.c) re-sorts
+#       only what changes between consecutive executions, so executions are
+#       ordered to have low total difference between consecutive ones.
+#       The difference of two executions is the number of mismatching loaded
+#       values (same as diff_hist.py). Only unique executions are ordered
+#       (duplicates have the same graph as their first-seen execution).
+#       Orders start from the first unique execution:
+#       - greedy: nearest unvisited execution (greedy nearest neighbor)
+#       - mst: preorder of a minimum spanning tree (Prim's algorithm),
+#              children are visited in ascending order of their difference
+#       Ties are broken by the lower execution index.
+#
+
+import sys
+import numpy
+
+# Loaded values of an execution in a flat tuple
+# history[thread][register index]: loaded values (see parse_hist.py, or simulate() in gen_mtrand.py)
+def getHistoryVector(history):
+    vector = []
+    if (isinstance(history, dict)):
+        threads = sorted(history.keys())
+    else:
+        threads = range(len(history))
+    for thread in threads:
+        threadHistory = history[thread]
+        if (isinstance(threadHistory, dict)):
+            registerIndices = sorted(threadHistory.keys())
+        else:
+            registerIndices = range(len(threadHistory))
+        for registerIndex in registerIndices:
+            vector.extend(threadHistory[registerIndex])
+    return tuple(vector)
+
+# Unique executions (first-seen execution index for each unique history)
+# hist[executionIndex]: history of an execution
+# Returns (uniqueIndices, vectors, duplicateOf)
+#   vectors[i]: history vector of uniqueIndices[i]
+#   duplicateOf[executionIndex]: first-seen execution index with the same history (for duplicates only)
+def getUniqueExecutions(hist):
+    uniqueIndices = []
+    vectors = []
+    duplicateOf = dict()
+    firstSeen = dict()
+    for executionIndex in hist:
+        vector = getHistoryVector(hist[executionIndex])
+        if (vector in firstSeen):
+            duplicateOf[executionIndex] = firstSeen[vector]
+        else:
+            firstSeen[vector] = executionIndex
+            uniqueIndices.append(executionIndex)
+            vectors.append(vector)
+    return (uniqueIndices, vectors, duplicateOf)
+
+# Order vectors (executions) by similarity
+# Returns (order, totalDifference): order[i] is the position in vectors of the i-th execution,
+#   totalDifference is the sum of differences between consecutive executions
+def orderBySimilarity(vectors, method):
+    numVectors = len(vectors)
+    if (numVectors == 0):
+        return ([], 0)
+    lengths = set([len(vector) for vector in vectors])
+    if (len(lengths) != 1):
+        print("Error: Executions have different numbers of loaded values %s" % (sorted(lengths)))
+        sys.exit(1)
+    mat = numpy.array(vectors, dtype=numpy.int64).reshape(numVectors, lengths.pop())
+    maxDifference = mat.shape[1] + 1
+
+    if (method == "index"):
+        order = list(range(numVectors))
+    elif (method == "greedy"):
+        visited = numpy.zeros(numVectors, dtype=bool)
+        order = [0]
+        visited[0] = True
+        for i in range(1, numVectors):
+            differences = (mat != mat[order[-1]]).sum(axis=1)
+            differences[visited] = maxDifference
+            nextVector = int(numpy.argmin(differences))
+            order.append(nextVector)
+            visited[nextVector] = True
+    elif (method == "mst"):
+        inTree = numpy.zeros(numVectors, dtype=bool)
+        bestDifference = numpy.full(numVectors, maxDifference, dtype=numpy.int64)
+        parent = numpy.zeros(numVectors, dtype=numpy.int64)
+        children = [[] for i in range(numVectors)]
+        vector = 0
+        inTree[0] = True
+        for i in range(1, numVectors):
+            differences = (mat != mat[vector]).sum(axis=1)
+            closer = (differences < bestDifference) & ~inTree
+            bestDifference[closer] = differences[closer]
+            parent[closer] = vector
+            candidates = numpy.where(inTree, maxDifference + 1, bestDifference)
+            vector = int(numpy.argmin(candidates))
+            inTree[vector] = True
+            children[int(parent[vector])].append((int(bestDifference[vector]), vector))
+        order = []
+        stack = [0]
+        while (len(stack) > 0):
+            vector = stack.pop()
+            order.append(vector)
+            for (difference, child) in sorted(children[vector], reverse=True):
+                stack.append(child)
+    else:
+        print("Error: Unrecognized execution order %s" % (method))
+        sys.exit(1)
+
+    totalDifference = 0
+    for i in range(1, numVectors):
+        totalDifference += int((mat[order[i]] != mat[order[i-1]]).sum())
+    return (order, totalDifference)
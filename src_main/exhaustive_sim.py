@@ -0,0 +1,121 @@
+##########################################################################
+#
+# MTraceCheck
+# Copyright 2017 The Regents of the University of Michigan
+# Doowon Lee and Valeria Bertacco
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+##########################################################################
+
+#
+# Exhaustive enumeration of load-value histories of a program
+#
+# NOTE: A simulation state is (set of performed instructions, memory contents).
+#       Interleavings reaching the same state have the same futures, so the
+#       outcomes of each state are computed once (memoization) and shared.
+#       Performed instructions are kept in a bitmask over flat indices.
+#
+# NOTE: The set of enabled instructions is the same as in gen_mtrand.py
+#       (simulateExecution): an instruction is enabled if it is in the
+#       scheduling window of its thread and all of its intra-thread
+#       dependencies are performed.
+#
+
+import instruction
+
+class StateLimitExceeded(Exception):
+    pass
+
+# Enumerate all load-value histories of compactProg
+# Returns (outcomes, numStates)
+#   outcomes[history] = number of interleavings (sequences of performed instructions) resulting in history
+#   history[thread * numHistRegs + loadTarget] = tuple of loaded values, in the order they are loaded
+def enumerateOutcomes(compactProg, numMemLocs, numHistRegs, numOutstandingOps, maxStates):
+    numThreads = compactProg.numThreads
+    threadStart = compactProg.threadStart
+    instType = compactProg.instType
+    address = compactProg.address
+    loadTarget = compactProg.loadTarget
+    memOp = compactProg.memOp
+
+    ## Static information
+    # depMask[flat]: bitmask of intra-thread dependencies
+    depMask = []
+    for flat in range(compactProg.numInsts):
+        mask = 0
+        for depFlat in compactProg.getIntraDeps(flat):
+            mask |= (1 << depFlat)
+        depMask.append(mask)
+
+    def getEnabledInsts(performed):
+        enabledInsts = []
+        for thread in range(numThreads):
+            numRetired = 0
+            for flat in range(threadStart[thread], threadStart[thread+1]):
+                if ((performed >> flat) & 1):
+                    numRetired += 1
+            windowEnd = min(threadStart[thread] + numRetired + numOutstandingOps, threadStart[thread+1])
+            for flat in range(threadStart[thread], windowEnd):
+                if (not ((performed >> flat) & 1) and (depMask[flat] & performed) == depMask[flat]):
+                    enabledInsts.append(flat)
+        return enabledInsts
+
+    # Add outcomes of a child state (after performing flat) to outcomes of its parent state
+    def mergeOutcomes(parentOutcomes, parentMem, flat, childOutcomes):
+        if (instType[flat] == 0):  # load: prepend loaded value to history of load target
+            value = parentMem[address[flat]]
+            slot = compactProg.threadIndex[flat] * numHistRegs + loadTarget[flat]
+            for childHistory in childOutcomes:
+                history = childHistory[:slot] + (((value,) + childHistory[slot]),) + childHistory[slot+1:]
+                parentOutcomes[history] = parentOutcomes.get(history, 0) + childOutcomes[childHistory]
+        else:
+            for childHistory in childOutcomes:
+                parentOutcomes[childHistory] = parentOutcomes.get(childHistory, 0) + childOutcomes[childHistory]
+
+    emptyHistory = tuple([() for i in range(numThreads * numHistRegs)])
+    initMem = tuple([instruction.getMemOp(0xffff, i) for i in range(numMemLocs)])
+    # memo[(performed, mem)] = outcomes of the remaining instructions
+    memo = dict()
+
+    ## Depth-first search (iterative, to avoid deep recursion)
+    # Each stack entry: [performed, mem, enabled instructions, next position, outcomes]
+    stack = [[0, initMem, getEnabledInsts(0), 0, dict()]]
+    while (len(stack) > 0):
+        frame = stack[-1]
+        (performed, mem, enabledInsts, position, outcomes) = frame
+        if (position < len(enabledInsts)):
+            frame[3] += 1
+            flat = enabledInsts[position]
+            childPerformed = performed | (1 << flat)
+            if (instType[flat] == 1):  # store
+                childMem = mem[:address[flat]] + (memOp[flat],) + mem[address[flat]+1:]
+            else:
+                childMem = mem
+            childKey = (childPerformed, childMem)
+            if (childKey in memo):
+                mergeOutcomes(outcomes, mem, flat, memo[childKey])
+            else:
+                stack.append([childPerformed, childMem, getEnabledInsts(childPerformed), 0, dict()])
+        else:
+            if (len(enabledInsts) == 0):  # all instructions performed
+                outcomes[emptyHistory] = 1
+            memo[(performed, mem)] = outcomes
+            if (len(memo) > maxStates):
+                raise StateLimitExceeded("Number of states exceeds %d" % maxStates)
+            stack.pop()
+            if (len(stack) > 0):
+                parentFrame = stack[-1]
+                mergeOutcomes(parentFrame[4], parentFrame[1], parentFrame[2][parentFrame[3]-1], outcomes)
+
+    return (memo[(0, initMem)], len(memo))
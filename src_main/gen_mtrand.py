@@ -29,8 +29,18 @@
 import os
 import sys
 import random
+import array
+import bisect
 import argparse
+import hashlib
+import pickle
+import multiprocessing
 import instruction
+import compact_program
+import hist_archive
+import exhaustive_sim
+import store_buffer_sim
+import signature_encoder
 
 #
 # Generation-time per-address store identifier
@@ -92,6 +102,11 @@ import instruction
 #def printUsage():
 #    print("Usage: python %s [# threads] [# instructions] [# memory locations] [# outstanding ops]" % (__file__))
 
+# Random integer generator with weighted bins
+# Bin type 0: a bin returns its value (constant)
+# Bin type 1: a bin returns its value plus offset within the bin (ranged)
+# NOTE: Each draw takes one integer from rng.randint(lower, upper-1), and
+#       its bin is found by bisecting the cumulative upper bounds of bins
 class RandomInteger():
 
     def __init__(self, paramLower=0):
@@ -99,6 +114,7 @@ class RandomInteger():
         self.upper = paramLower
         self.binType = -1
         self.bins = []
+        self.binMaxs = []  # binMaxs[binIdx] = upper bound (exclusive) of bin, in ascending order
         self.numBins = 0
 
     def setBinType(self, paramBinType):
@@ -113,19 +129,38 @@ class RandomInteger():
         binMax = self.upper + frequency
         self.upper = binMax
         self.bins.append([binMin, binMax, value])
+        self.binMaxs.append(binMax)
         self.numBins = self.numBins + 1
 
-    def genRand(self):
-        randInt = random.randint(self.lower, self.upper-1)  # self.lower <= N < self.upper
-        for binIdx in range(self.numBins):
-            if ((self.bins[binIdx][0] <= randInt) and (self.bins[binIdx][1] > randInt)):
-                if (self.binType == 0):
-                    return self.bins[binIdx][2]
-                elif (self.binType == 1):
-                    return self.bins[binIdx][2] + (randInt - self.bins[binIdx][0])
-        # Index not found
-        print("Error: Random value %d is not found from RandomInteger class (lower bound %d, upper bound %d)" % (randInt, self.lower, self.upper-1))
-        sys.exit(1)
+    def getValue(self, randInt):
+        binIdx = bisect.bisect_right(self.binMaxs, randInt)
+        if (randInt < self.lower or binIdx >= self.numBins):
+            # Index not found
+            print("Error: Random value %d is not found from RandomInteger class (lower bound %d, upper bound %d)" % (randInt, self.lower, self.upper-1))
+            sys.exit(1)
+        if (self.binType == 0):
+            return self.bins[binIdx][2]
+        else:
+            return self.bins[binIdx][2] + (randInt - self.bins[binIdx][0])
+
+    def genRand(self, rng=random):
+        randInt = rng.randint(self.lower, self.upper-1)  # self.lower <= N < self.upper
+        return self.getValue(randInt)
+
+    # Draw n values at once (array of integers)
+    # NOTE: The result is the same as n consecutive calls of genRand()
+    def sample(self, n, rng=random):
+        assert(self.binType != -1 and self.numBins > 0)
+        randrange = rng.randrange
+        lower = self.lower
+        upper = self.upper
+        randInts = [randrange(lower, upper) for i in range(n)]  # randint(a, b) is randrange(a, b+1)
+        if (self.binType == 1 and self.numBins == 1):
+            # Single ranged bin: value is offset from lower bound
+            offset = self.bins[0][2] - lower
+            return array.array('l', [randInt + offset for randInt in randInts])
+        getValue = self.getValue
+        return array.array('l', [getValue(randInt) for randInt in randInts])
 
     def printBins(self):
         assert(self.numBins == len(self.bins))
@@ -135,110 +170,118 @@ class RandomInteger():
 
 
 ############################################################
-## Processing command line arguments
+## Configuration
 ############################################################
-#if (len(sys.argv) != 5):
-#    printUsage()
-#    sys.exit(1)
-
-#try:
-#    numThreads = int(sys.argv[1])
-#    numInsts = int(sys.argv[2])
-#    numMemLocs = int(sys.argv[3])
-#    numOutstandingOps = int(sys.argv[4])
-#except:
-#    printUsage()
-#    sys.exit(1)
-
-parser = argparse.ArgumentParser(description="Arguments for %s" % __file__)
-parser.add_argument("--verbose", "-v", action="count", default=0)
-parser.add_argument("--debug", "-d", action="store_true", default=False)
-parser.add_argument("--rand-seed", type=int, help="random seed", default=894291)
-parser.add_argument("--threads", "-t", type=int, help="number of threads to be generated", default=2)
-parser.add_argument("--insts", "-i", type=int, help="number of memory operations to be generated for each thread", default=10)
-parser.add_argument("--locs", "-l", type=int, help="number of memory target locations", default=4)
-parser.add_argument("--outstanding", "-o", type=int, help="number of outstanding memory operations for each thread (-1: entire range)", default=-1)
-parser.add_argument("--execs", "-e", type=int, help="number of executions", default=10)
-parser.add_argument("--hist-regs", type=int, help="number of registers to save loaded value", default=16)
-parser.add_argument("--hist-per-reg", type=int, help="number of loaded values per history register (-1: unlimited)", default=-1)
-parser.add_argument("--log-dir", help="directory to save individual log files", default="log")
-parser.add_argument("--summary-dir", help="directory to save summary files (e.g., md5 hashes)", default=None)
-parser.add_argument("--consistency-model", help="consistency model", default="sc")
-parser.add_argument("--single-copy-atomicity", action="store_true", default=False)
-parser.add_argument("--gen-program", action="store_true", help="generate intermediate file that represents a generated multi-threaded program, with intra-thread dependency annotated", default=False)
-parser.add_argument("--prog-file", help="intermediate program file name", default="prog.txt")
-parser.add_argument("--wo-file", help="intermediate write-order file name", default="wo.txt")
-parser.add_argument("--no-dump-files", action="store_true", help="do not generate memory dump files", default=False)
-parser.add_argument("--with-fences", action="store_true", default=False)
-args = parser.parse_args()
-
-verbosity = args.verbose
-numThreads = args.threads
-numInsts = args.insts
-numMemLocs = args.locs
-if (args.outstanding == -1):
-    numOutstandingOps = args.insts
-else:
-    numOutstandingOps = args.outstanding
-numExecutions = args.execs
-numHistRegs = args.hist_regs
-numHistPerReg = args.hist_per_reg
-if (args.log_dir == None):
-    logDirPrefix = "."
-elif (args.log_dir[-1] != "/"):
-    logDirPrefix = args.log_dir
-else: # Remove "/" at the end of string
-    logDirPrefix = args.log_dir[:-1]
-if (args.summary_dir == None):
-    summaryDirPrefix = "."
-elif (args.summary_dir[-1] != "/"):
-    summaryDirPrefix = args.summary_dir
-else:
-    summaryDirPrefix = args.summary_dir[:-1]
-
-if not os.path.exists(logDirPrefix):
-    os.makedirs(logDirPrefix)
-if not os.path.exists(summaryDirPrefix):
-    os.makedirs(summaryDirPrefix)
-
-#print("debug: numOutstandingOps %d" % numOutstandingOps)
+
+# Configuration of program generation and simulation
+# numThreads: number of threads to be generated
+# numInsts: number of memory operations to be generated for each thread
+# numMemLocs: number of memory target locations
+# numOutstandingOps: number of outstanding memory operations for each thread (-1: entire range)
+# numHistRegs: number of registers to save loaded value
+# consistencyModel: "sc", "tso", "ro", or "wo"
+# singleCopyAtomicity: same-address ordering (store->store, store->load) in each thread
+# withFences: fences are generated (2%)
+# bulkSampling: instruction fields are drawn in bulk for each thread (faster, but a different program for the same seed)
+# multiCopyAtomicity: stores become visible to all threads at once (store-buffer scheduler, see store_buffer_sim.py)
+# randSeed: random seed for program generation (and simulation, see simulate())
+# verbosity, debug: messages printed to standard output
+def getDefaultConfig():
+    return {"numThreads": 2, "numInsts": 10, "numMemLocs": 4, "numOutstandingOps": -1, "numHistRegs": 16,
+            "consistencyModel": "sc", "singleCopyAtomicity": False, "withFences": False, "bulkSampling": False,
+            "multiCopyAtomicity": True, "randSeed": 894291, "verbosity": 0, "debug": False}
+
+# Reordering constraints of a consistency model
+# Returns (orderLdLd, orderLdSt, orderStLd, orderStSt)
+def getOrderingRules(consistencyModel):
+    if (consistencyModel == "sc"):
+        # Sequential consistency (SC)
+        return (True, True, True, True)
+    elif (consistencyModel == "tso"):
+        # Total store ordering (TSO)
+        return (True, True, False, True)
+    elif (consistencyModel == "ro"):
+        # Relaxed ordering (RO)
+        return (False, False, False, False)
+    elif (consistencyModel == "wo"):
+        # Weak ordering (WO)
+        return (False, False, False, False)
+    else:
+        print("Error: Unrecognized consistency model %s" % consistencyModel)
+        sys.exit(1)
 
 ############################################################
-## Script initialization
+## Create constraint edges (intra-thread)
 ############################################################
 
-random.seed(args.rand_seed)
-
-## Define reordering constraints for simulation
-if (args.consistency_model == "sc"):
-    # Sequential consistency (SC)
-    orderLdLd = True
-    orderLdSt = True
-    orderStLd = True
-    orderStSt = True
-elif (args.consistency_model == "tso"):
-    # Total store ordering (TSO)
-    orderLdLd = True
-    orderLdSt = True
-    orderStLd = False
-    orderStSt = True
-elif (args.consistency_model == "ro"):
-    # Relaxed ordering (RO)
-    orderLdLd = False
-    orderLdSt = False
-    orderStLd = False
-    orderStSt = False
-elif (args.consistency_model == "wo"):
-    # Weak ordering (WO)
-    orderLdLd = False
-    orderLdSt = False
-    orderStLd = False
-    orderStSt = False
-else:
-    print("Error: Unrecognized consistency model %s" % args.consistency_model)
-
-if (verbosity > 0):
-    print("Memory consistency model %s" % (args.consistency_model))
+# Create intra-thread dependencies of instructions (insts[thread][inst]) under a consistency model
+# NOTE: This is also used to check histories against other models (see cycle_checker.py --models)
+def addIntraDependencies(insts, consistencyModel, singleCopyAtomicity):
+    (orderLdLd, orderLdSt, orderStLd, orderStSt) = getOrderingRules(consistencyModel)
+
+    ## Memory reordering rules (either different or same address)
+    for thread in range(len(insts)):
+        lastLdIndex = -1
+        lastStIndex = -1
+        lastFenceIndex = -1
+        # FIXME: intra dependency edges from/to fences
+        for inst in range(len(insts[thread])):
+            if (insts[thread][inst].instType == 0):  # if instType == LOAD
+                if (orderLdLd and lastLdIndex != -1):
+                    insts[thread][inst].addIntraDep(instruction.getMemOp(thread, lastLdIndex))
+                if (orderStLd and lastStIndex != -1):
+                    insts[thread][inst].addIntraDep(instruction.getMemOp(thread, lastStIndex))
+                if (lastFenceIndex != -1):
+                    insts[thread][inst].addIntraDep(instruction.getMemOp(thread, lastFenceIndex))
+                lastLdIndex = inst
+            elif (insts[thread][inst].instType == 1):  # if instType == STORE
+                if (orderLdSt and lastLdIndex != -1):
+                    insts[thread][inst].addIntraDep(instruction.getMemOp(thread, lastLdIndex))
+                if (orderStSt and lastStIndex != -1):
+                    insts[thread][inst].addIntraDep(instruction.getMemOp(thread, lastStIndex))
+                if (lastFenceIndex != -1):
+                    insts[thread][inst].addIntraDep(instruction.getMemOp(thread, lastFenceIndex))
+                lastStIndex = inst
+            elif (insts[thread][inst].instType == 2):  # if instType == FENCE
+                # NOTE: dependency to this fence will be created in the next for loop
+                lastFenceIndex = inst
+            else:
+                print ("Error: Unrecognized instruction type %d" % insts[thread][inst].instType)
+        reverseLastFenceIndex = -1
+        for inst in reversed(range(len(insts[thread]))):
+            if (insts[thread][inst].instType == 0):  # if instType == LOAD
+                if (reverseLastFenceIndex != -1):
+                    insts[thread][reverseLastFenceIndex].addIntraDep(instruction.getMemOp(thread, inst))
+            elif (insts[thread][inst].instType == 1):  # if instType == STORE
+                if (reverseLastFenceIndex != -1):
+                    insts[thread][reverseLastFenceIndex].addIntraDep(instruction.getMemOp(thread, inst))
+            elif (insts[thread][inst].instType == 2):  # if instType == FENCE
+                if (reverseLastFenceIndex != -1):
+                    insts[thread][reverseLastFenceIndex].addIntraDep(instruction.getMemOp(thread, inst))
+                reverseLastFenceIndex = inst
+            else:
+                print ("Error: Unrecognized instruction type %d" % insts[thread][inst].instType)
+
+    ## Program order (same address)
+    # This code assumes cache coherency by creating edges for same address for:
+    # (1) store->store
+    # (2) (last) store->load
+    #
+    # NOTE: This is now enabled optionally, depending on single-copy atomicity flag
+    #
+    # NOTE: Each load/store depends on the last store to the same address,
+    #       found by a forward sweep with per-address last-store indices
+    if (singleCopyAtomicity):
+        for thread in range(len(insts)):
+            lastStIndexPerAddr = dict()  # lastStIndexPerAddr[address] = index of last store to address
+            for inst in range(len(insts[thread])):
+                if (insts[thread][inst].instType == 0 or insts[thread][inst].instType == 1):  # if instType == LOAD or STORE
+                    address = insts[thread][inst].address
+                    if (address in lastStIndexPerAddr):  # case (1) and (2) above
+                        insts[thread][inst].addIntraDep(instruction.getMemOp(thread, lastStIndexPerAddr[address]))
+                    if (insts[thread][inst].instType == 1):
+                        lastStIndexPerAddr[address] = inst
+                # FIXME: Need to consider additional types of instructions?
 
 ############################################################
 ## Generate random test program
@@ -255,129 +298,95 @@ if (verbosity > 0):
 
 # Every data source should be either from initial value of memory, or stored value
 
-## Type of instruction: load (0), store (1), fence (2)
-randInstType = RandomInteger()
-randInstType.setBinType(0)
-if (args.with_fences):
-    ## doowon, 2017/09/06, fences are included in generated test with the probability of 2%
-    # TODO: Flexible percentages
-    randInstType.addBin(49, 0)  # 49%, 0 (load)
-    randInstType.addBin(49, 1)  # 49%, 1 (store)
-    randInstType.addBin( 2, 2)  #  2%, 2 (fence)
-else:
-    randInstType.addBin(50, 0)  # 50%, 0 (load)
-    randInstType.addBin(50, 1)  # 50%, 1 (store)
-if (verbosity > 0):
-    randInstType.printBins()
-
-## Random number generator for addresses
-# Memory addresses are generated fully randomly, without considering previous addresses
-randAddress = RandomInteger()  # Memory address: 0 -- (numMemLocs-1) with equal probability
-randAddress.setBinType(1)
-randAddress.addBin(numMemLocs, 0)
-if (verbosity > 0):
-    randAddress.printBins()
-
-## Random number generator for load targets
-randLoadTarget = RandomInteger()  # Load target: 0 -- (numHistRegs-1) e.g., r0 -- r15
-randLoadTarget.setBinType(1)
-randLoadTarget.addBin(numHistRegs, 0)
-if (verbosity > 0):
-    randLoadTarget.printBins()
-
-insts = [[] for i in range(numThreads)]
-
-for thread in range(numThreads):
-    for inst in range(numInsts):
-        instType = randInstType.genRand()
-        address = randAddress.genRand()
-        loadTarget = randLoadTarget.genRand()
-        currInst = instruction.Instruction(instType, address, loadTarget)
-        insts[thread].append(currInst)
-
-# Print generated instructions
-if (verbosity > 0):
-    print("### Printing generated instructions")
-    for thread in range(numThreads):
-        print("Thread %d" % (thread))
-        for inst in range(len(insts[thread])):
-            insts[thread][inst].printInst()
+# Generate a random test program and its intra-thread dependencies
+# Returns a program (dictionary)
+#   config: configuration (numOutstandingOps is resolved if -1)
+#   insts[thread][inst]: instruction.Instruction objects, with intra-thread dependencies
+#   compactProg, executionBuffers: compact representation (see compact_program.py)
+#   orderStSt: True if stores are ordered (write order is defined)
+#   rng: random number generator used for generation (simulation continues this stream, see simulate())
+def generateProgram(config):
+    config = dict(config)
+    numThreads = config["numThreads"]
+    numInsts = config["numInsts"]
+    numMemLocs = config["numMemLocs"]
+    numHistRegs = config["numHistRegs"]
+    verbosity = config["verbosity"]
+    if (config["numOutstandingOps"] == -1):
+        config["numOutstandingOps"] = numInsts
+    rng = random.Random(config["randSeed"])
+
+    ## Define reordering constraints for simulation
+    (orderLdLd, orderLdSt, orderStLd, orderStSt) = getOrderingRules(config["consistencyModel"])
+    if (verbosity > 0):
+        print("Memory consistency model %s" % (config["consistencyModel"]))
+
+    ## Type of instruction: load (0), store (1), fence (2)
+    randInstType = RandomInteger()
+    randInstType.setBinType(0)
+    if (config["withFences"]):
+        ## doowon, 2017/09/06, fences are included in generated test with the probability of 2%
+        # TODO: Flexible percentages
+        randInstType.addBin(49, 0)  # 49%, 0 (load)
+        randInstType.addBin(49, 1)  # 49%, 1 (store)
+        randInstType.addBin( 2, 2)  #  2%, 2 (fence)
+    else:
+        randInstType.addBin(50, 0)  # 50%, 0 (load)
+        randInstType.addBin(50, 1)  # 50%, 1 (store)
+    if (verbosity > 0):
+        randInstType.printBins()
 
+    ## Random number generator for addresses
+    # Memory addresses are generated fully randomly, without considering previous addresses
+    randAddress = RandomInteger()  # Memory address: 0 -- (numMemLocs-1) with equal probability
+    randAddress.setBinType(1)
+    randAddress.addBin(numMemLocs, 0)
+    if (verbosity > 0):
+        randAddress.printBins()
 
-############################################################
-## Create constraint edges (intra-thread)
-############################################################
+    ## Random number generator for load targets
+    randLoadTarget = RandomInteger()  # Load target: 0 -- (numHistRegs-1) e.g., r0 -- r15
+    randLoadTarget.setBinType(1)
+    randLoadTarget.addBin(numHistRegs, 0)
+    if (verbosity > 0):
+        randLoadTarget.printBins()
 
-## Memory reordering rules (either different or same address)
-for thread in range(numThreads):
-    lastLdIndex = -1
-    lastStIndex = -1
-    lastFenceIndex = -1
-    # FIXME: intra dependency edges from/to fences
-    for inst in range(len(insts[thread])):
-        if (insts[thread][inst].instType == 0):  # if instType == LOAD
-            if (orderLdLd and lastLdIndex != -1):
-                insts[thread][inst].addIntraDep(instruction.getMemOp(thread, lastLdIndex))
-            if (orderStLd and lastStIndex != -1):
-                insts[thread][inst].addIntraDep(instruction.getMemOp(thread, lastStIndex))
-            if (lastFenceIndex != -1):
-                insts[thread][inst].addIntraDep(instruction.getMemOp(thread, lastFenceIndex))
-            lastLdIndex = inst
-        elif (insts[thread][inst].instType == 1):  # if instType == STORE
-            if (orderLdSt and lastLdIndex != -1):
-                insts[thread][inst].addIntraDep(instruction.getMemOp(thread, lastLdIndex))
-            if (orderStSt and lastStIndex != -1):
-                insts[thread][inst].addIntraDep(instruction.getMemOp(thread, lastStIndex))
-            if (lastFenceIndex != -1):
-                insts[thread][inst].addIntraDep(instruction.getMemOp(thread, lastFenceIndex))
-            lastStIndex = inst
-        elif (insts[thread][inst].instType == 2):  # if instType == FENCE
-            # NOTE: dependency to this fence will be created in the next for loop
-            lastFenceIndex = inst
-        else:
-            print ("Error: Unrecognized instruction type %d" % insts[thread][inst].instType)
-    reverseLastFenceIndex = -1
-    for inst in reversed(range(len(insts[thread]))):
-        if (insts[thread][inst].instType == 0):  # if instType == LOAD
-            if (reverseLastFenceIndex != -1):
-                insts[thread][reverseLastFenceIndex].addIntraDep(instruction.getMemOp(thread, inst))
-        elif (insts[thread][inst].instType == 1):  # if instType == STORE
-            if (reverseLastFenceIndex != -1):
-                insts[thread][reverseLastFenceIndex].addIntraDep(instruction.getMemOp(thread, inst))
-        elif (insts[thread][inst].instType == 2):  # if instType == FENCE
-            if (reverseLastFenceIndex != -1):
-                insts[thread][reverseLastFenceIndex].addIntraDep(instruction.getMemOp(thread, inst))
-            reverseLastFenceIndex = inst
-        else:
-            print ("Error: Unrecognized instruction type %d" % insts[thread][inst].instType)
-    # Avoid using these temporary variables accidentally later on
-    del lastLdIndex
-    del lastStIndex
-    del lastFenceIndex
-    del reverseLastFenceIndex
-
-## Program order (same address)
-# This code assumes cache coherency by creating edges for same address for:
-# (1) store->store
-# (2) (last) store->load
-#
-# NOTE: This is now enabled optionally, depending on single-copy atomicity flag
-#
-if (args.single_copy_atomicity):
-    for thread in range(numThreads):
-        for instA in range(len(insts[thread])-1): # For each A for A->B edges
-            if (insts[thread][instA].instType == 1):  # if instType == STORE
-                addressA = insts[thread][instA].address
-                for instB in range(instA+1, len(insts[thread])):
-                    addressB = insts[thread][instB].address
-                    if (insts[thread][instB].instType == 0 and addressB == addressA):  # if instType == LOAD with same address (case (2) above)
-                        insts[thread][instB].addIntraDep(instruction.getMemOp(thread, instA))
-                    elif (insts[thread][instB].instType == 1 and addressB == addressA):  # if instType == STORE with same address (case (1) above)
-                        insts[thread][instB].addIntraDep(instruction.getMemOp(thread, instA))
-                        # Instruction B should be the source for next instructions (no further check)
-                        break
-                    # FIXME: Need to consider additional types of instructions?
-            # No other types (e.g., LOAD) need to be considered
+    insts = [[] for i in range(numThreads)]
+
+    if (config["bulkSampling"]):
+        # NOTE: Instruction types, addresses and load targets of a thread are
+        #       drawn in bulk, so the program differs from per-instruction draws
+        for thread in range(numThreads):
+            instTypes = randInstType.sample(numInsts, rng)
+            addresses = randAddress.sample(numInsts, rng)
+            loadTargets = randLoadTarget.sample(numInsts, rng)
+            for inst in range(numInsts):
+                insts[thread].append(instruction.Instruction(instTypes[inst], addresses[inst], loadTargets[inst]))
+    else:
+        for thread in range(numThreads):
+            for inst in range(numInsts):
+                instType = randInstType.genRand(rng)
+                address = randAddress.genRand(rng)
+                loadTarget = randLoadTarget.genRand(rng)
+                currInst = instruction.Instruction(instType, address, loadTarget)
+                insts[thread].append(currInst)
+
+    # Print generated instructions
+    if (verbosity > 0):
+        print("### Printing generated instructions")
+        for thread in range(numThreads):
+            print("Thread %d" % (thread))
+            for inst in range(len(insts[thread])):
+                insts[thread][inst].printInst()
+
+    ## Intra-thread dependencies
+    addIntraDependencies(insts, config["consistencyModel"], config["singleCopyAtomicity"])
+
+    ## Compact program representation (used by event-driven and batch schedulers, and exhaustive enumeration)
+    compactProg = compact_program.fromInstructions(insts)
+    executionBuffers = compact_program.ExecutionBuffers(compactProg, numMemLocs)
+
+    return {"config": config, "insts": insts, "compactProg": compactProg, "executionBuffers": executionBuffers, "orderStSt": orderStSt, "rng": rng}
 
 ############################################################
 ## Write the generated program and intra-thread dependency in an intermediate file
@@ -395,12 +404,11 @@ if (args.single_copy_atomicity):
 0/2#ld 0x2,r10#0#1
 """
 
-if (args.gen_program):
-    progFileName = "%s/%s" % (summaryDirPrefix, args.prog_file)
-    woFileName = "%s/%s" % (summaryDirPrefix, args.wo_file)
+def writeProgramFiles(program, progFileName, woFileName):
+    insts = program["insts"]
     progFP = open(progFileName, "w")
     woFP = open(woFileName, "w")
-    for thread in range(numThreads):
+    for thread in range(len(insts)):
         for inst in range(len(insts[thread])):
             instructionLine = "%d/%d#%s" % (thread, inst, insts[thread][inst].getAssembly())
             for intraDep in insts[thread][inst].intraDeps:
@@ -408,7 +416,7 @@ if (args.gen_program):
                 instructionLine += ("#%d" % (intraDepInstIndex))
             instructionLine += "\n"
             progFP.write(instructionLine)
-        if (orderStSt):
+        if (program["orderStSt"]):
             # doowon, 2017/09/06, FIXME: Write order needs to handle fences
             woDict = dict()
             for inst in range(len(insts[thread])):
@@ -431,15 +439,25 @@ if (args.gen_program):
     woFP.close()
 
 ############################################################
-## Execution iteration loop
+## Simulate an execution
 ############################################################
-if (not args.no_dump_files):
-    dumpSummaryFileName = "%s/dump.txt" % (summaryDirPrefix)
-    dumpSummaryFP = open(dumpSummaryFileName, "w")
-histSummaryFileName = "%s/hist.txt" % (summaryDirPrefix)
-histSummaryFP = open(histSummaryFileName, "w")
 
-for executionIndex in range(numExecutions):
+# Random seed for an execution simulated with its own random number generator
+# NOTE: It depends only on --rand-seed and the execution index, not on the
+#       order (or the process) in which executions are simulated.
+def getExecutionSeed(randSeed, executionIndex):
+    seedString = "%d/%d" % (randSeed, executionIndex)
+    return int(hashlib.md5(seedString.encode("ascii")).hexdigest()[:16], 16)
+
+def simulateExecution(program, executionIndex, rng):
+    config = program["config"]
+    insts = program["insts"]
+    numThreads = config["numThreads"]
+    numMemLocs = config["numMemLocs"]
+    numHistRegs = config["numHistRegs"]
+    numOutstandingOps = config["numOutstandingOps"]
+    verbosity = config["verbosity"]
+    debug = config["debug"]
 
     if (verbosity > 0):
         print("Execution %d" % executionIndex)
@@ -496,8 +514,8 @@ for executionIndex in range(numExecutions):
 
     ## NOTE: Single-copy, multiple-copy, non-multiple-copy atomic stores should
     # be considered in some way. Currently, the code assumes single-copy atomicity.
-    # Taking into account multiple-copy and non-multiple-copy atomic stores can be
-    # done by having multiple instances of 'mem' storages.
+    # Store buffers and multiple instances of 'mem' storages (per-thread views)
+    # are simulated by the store-buffer scheduler (see store_buffer_sim.py).
 
     ## NOTE: This version of code does not accommodate transitivity, generating
     # all operation-to-operation dependency.
@@ -510,15 +528,15 @@ for executionIndex in range(numExecutions):
 
     while (len(unfinishedThreadList) > 0):
         ## Choose a thread to execute
-        randInt = random.randint(0, len(unfinishedThreadList)-1)  # 0 <= randInt < len(unfinishedThreadList)
+        randInt = rng.randint(0, len(unfinishedThreadList)-1)  # 0 <= randInt < len(unfinishedThreadList)
         thread = unfinishedThreadList[randInt]
-        if (args.debug):
+        if (debug):
             print("debug: thread random integer %d" % (randInt))
 
         ## Choose an instruction to execute
-        randInt = random.randint(0, len(readyQueues[thread])-1)  # 0 <= randInt < len(readyQueues[thread])
+        randInt = rng.randint(0, len(readyQueues[thread])-1)  # 0 <= randInt < len(readyQueues[thread])
         inst = readyQueues[thread][randInt]
-        if (args.debug):
+        if (debug):
             print("debug: instruction random integer %d" % (randInt))
 
         ## Print verbose & debug messages
@@ -562,7 +580,7 @@ for executionIndex in range(numExecutions):
                 if (insts[thread][intraDepInstIndex].exeState != instruction.ExecutionState.PERFORMED):
                     isReady = False
                     break
-            if (args.debug):
+            if (debug):
                 print("thread %d candInst %d ready %d" % (thread, candInst, isReady))
             if (isReady and insts[thread][candInst].exeState == instruction.ExecutionState.WAIT):
                 insts[thread][candInst].exeState = instruction.ExecutionState.READY
@@ -667,26 +685,244 @@ for executionIndex in range(numExecutions):
         else:
             print("(Exec%d) INFO: Cycle detected!!!" % (executionIndex))
 
+    loadValues = [insts[thread][inst].value for thread in range(numThreads) for inst in range(len(insts[thread]))]
+    return {"mem": mem, "history": historyLoadTargets, "loadValues": loadValues}
+
+# Simulate an execution with the event-driven scheduler (--scheduler=event)
+# NOTE: This function works on compactProg and executionBuffers of program only,
+#       and makes the same random choices as simulateExecution().
+#       Instead of rescanning scheduling windows, retiring an instruction
+#       decrements the pending-dependency counters of its dependent
+#       instructions. Reverse dependencies are in ascending order, which is
+#       the order of scheduling windows, so ready queues are identical.
+def simulateExecutionCompact(program, executionIndex, rng):
+    config = program["config"]
+    compactProg = program["compactProg"]
+    executionBuffers = program["executionBuffers"]
+    numThreads = config["numThreads"]
+    numHistRegs = config["numHistRegs"]
+    numOutstandingOps = config["numOutstandingOps"]
+    verbosity = config["verbosity"]
+    debug = config["debug"]
+
+    if (verbosity > 0):
+        print("Execution %d" % executionIndex)
+
     ############################################################
-    ## Generate output: memory dump
+    ## Initialization
     ############################################################
-    if (not args.no_dump_files):
-        stringToWrite = ""
-        for i in range(numMemLocs):
-            stringToWrite += ("%08x\n" % mem[i])
 
-        dumpFileName = "%s/dump%d.txt" % (logDirPrefix, executionIndex)
-        dumpFP = open(dumpFileName, "w")
-        dumpFP.write(stringToWrite)
-        dumpFP.close()
+    executionBuffers.reset()
+    pendingDeps = executionBuffers.pendingDeps
+    loadValues = executionBuffers.value
+    mem = executionBuffers.mem
+    threadStart = compactProg.threadStart
+    instType = compactProg.instType
+    address = compactProg.address
+    loadTarget = compactProg.loadTarget
+    memOp = compactProg.memOp
+    reverseDepPtr = compactProg.reverseDepPtr
+    reverseDepIdx = compactProg.reverseDepIdx
 
-        dumpSummaryFP.write("### Execution %d\n" % (executionIndex))
-        dumpSummaryFP.write(stringToWrite)
+    ## Initialize load-target register
+    historyLoadTargets = [[[] for i in range(numHistRegs)] for j in range(numThreads)]
+
+    ## Initialize ready queues
+    # NOTE: Instructions in scheduling window are those with index below
+    #       nextQueueInsts[thread] not performed yet
+    readyQueues = []
+    nextQueueInsts = []
+    for thread in range(numThreads):
+        threadReadyQueue = []
+        numThreadInsts = threadStart[thread+1] - threadStart[thread]
+        for instIndex in range(min(numOutstandingOps, numThreadInsts)):
+            if (pendingDeps[threadStart[thread] + instIndex] == 0):
+                threadReadyQueue.append(instIndex)
+        readyQueues.append(threadReadyQueue)
+        nextQueueInsts.append(min(numOutstandingOps, numThreadInsts))
+
+    ############################################################
+    ## Execute test program
+    ############################################################
+
+    unfinishedThreadList = [i for i in range(numThreads)]
+
+    while (len(unfinishedThreadList) > 0):
+        ## Choose a thread to execute
+        randInt = rng.randint(0, len(unfinishedThreadList)-1)  # 0 <= randInt < len(unfinishedThreadList)
+        thread = unfinishedThreadList[randInt]
+        if (debug):
+            print("debug: thread random integer %d" % (randInt))
+
+        ## Choose an instruction to execute
+        readyQueue = readyQueues[thread]
+        randInt = rng.randint(0, len(readyQueue)-1)  # 0 <= randInt < len(readyQueue)
+        inst = readyQueue[randInt]
+        if (debug):
+            print("debug: instruction random integer %d" % (randInt))
+        flat = threadStart[thread] + inst
+
+        ## Print verbose & debug messages
+        if (verbosity > 1):
+            print("Execute: thread %d inst %d (%s)" % (thread, inst, compactProg.getInstruction(flat).getAssembly()))
+
+        ## Execute the instruction
+        # 1. Update loaded value and load-value history (load) or mem (store)
+        if (instType[flat] == 0):  # if instType == LOAD
+            loadValue = mem[address[flat]]
+            loadValues[flat] = loadValue
+            historyLoadTargets[thread][loadTarget[flat]].append(loadValue)
+        elif (instType[flat] == 1):  # if instType == STORE
+            mem[address[flat]] = memOp[flat]
+        # Fences do not have any effect in registers or memory
+
+        # 2. Update ready queue
+        del readyQueue[randInt]
+
+        # 3. Wake up dependent instructions (only those in scheduling window)
+        windowEnd = threadStart[thread] + nextQueueInsts[thread]
+        for ptr in range(reverseDepPtr[flat], reverseDepPtr[flat+1]):
+            depFlat = reverseDepIdx[ptr]
+            pendingDeps[depFlat] -= 1
+            if (pendingDeps[depFlat] == 0 and depFlat < windowEnd):
+                readyQueue.append(depFlat - threadStart[thread])
+
+        # 4. Add next instruction to scheduling window
+        if (windowEnd < threadStart[thread+1]):
+            if (pendingDeps[windowEnd] == 0):
+                readyQueue.append(nextQueueInsts[thread])
+            nextQueueInsts[thread] += 1
+
+        # 5. Check for thread end
+        if (len(readyQueue) == 0):
+            unfinishedThreadList.remove(thread)
+
+    ############################################################
+    ## Check for cycles (topological sorting)
+    ############################################################
+    # NOTE: The result is only reported in verbose mode, so skip it otherwise
+    if (verbosity > 1):
+        ## Incoming edges: intra-thread dependencies and reads-from dependency
+        inDegree = array.array('l', executionBuffers.initPendingDeps)
+        readers = dict()  # readers[store flat index] = loads reading the store
+        for thread in range(numThreads):
+            for flat in range(threadStart[thread], threadStart[thread+1]):
+                if (instType[flat] == 0):  # if instType == LOAD
+                    if (loadValues[flat] == 0xffffffff):
+                        print("Warning: Load instruction at thread %d instruction %d has invalid load value %d" % (thread, flat - threadStart[thread], loadValues[flat]))
+                        continue
+                    aThreadIndex = instruction.getThreadIndex(loadValues[flat])
+                    if (aThreadIndex != 0xffff):
+                        aFlat = threadStart[aThreadIndex] + instruction.getInstIndex(loadValues[flat])
+                        if (not aFlat in readers):
+                            readers[aFlat] = []
+                        readers[aFlat].append(flat)
+                        inDegree[flat] += 1
+        waitQueue = [flat for flat in range(compactProg.numInsts) if inDegree[flat] == 0]
+        numSorted = 0
+        while len(waitQueue) > 0:
+            currFlat = waitQueue.pop()
+            numSorted += 1
+            for ptr in range(reverseDepPtr[currFlat], reverseDepPtr[currFlat+1]):
+                bFlat = reverseDepIdx[ptr]
+                inDegree[bFlat] -= 1
+                if (inDegree[bFlat] == 0):
+                    waitQueue.append(bFlat)
+            if (currFlat in readers):
+                for bFlat in readers[currFlat]:
+                    inDegree[bFlat] -= 1
+                    if (inDegree[bFlat] == 0):
+                        waitQueue.append(bFlat)
+        if (numSorted == compactProg.numInsts):
+            print("(Exec%d) INFO: Cycle undetected" % (executionIndex))
+        else:
+            print("(Exec%d) INFO: Cycle detected!!!" % (executionIndex))
+
+    return {"mem": array.array('l', mem), "history": historyLoadTargets, "loadValues": array.array('l', loadValues)}
+
+# Simulate an execution with per-thread store buffers (--scheduler=store-buffer)
+# NOTE: The simulator is created at the first execution of program, and
+#       its buffers are reused in later executions
+def simulateExecutionStoreBuffer(program, executionIndex, rng):
+    config = program["config"]
+    if (config["verbosity"] > 0):
+        print("Execution %d" % executionIndex)
+    if (not "storeBufferSim" in program):
+        program["storeBufferSim"] = store_buffer_sim.StoreBufferSimulator(program["compactProg"], config["numMemLocs"], config["numHistRegs"], config["numOutstandingOps"], config["multiCopyAtomicity"])
+    return program["storeBufferSim"].simulateExecution(rng, config["verbosity"])
+
+# Simulate an execution with the given scheduler ("window", "event", or "store-buffer")
+def simulateExecutionWithScheduler(program, executionIndex, rng, scheduler):
+    if (scheduler == "event"):
+        return simulateExecutionCompact(program, executionIndex, rng)
+    elif (scheduler == "store-buffer"):
+        return simulateExecutionStoreBuffer(program, executionIndex, rng)
+    else:
+        return simulateExecution(program, executionIndex, rng)
+
+# Simulate a batch of executions in lockstep (NumPy required, see batch_sim.py)
+# NOTE: The batch is seeded with the seed of its first execution, so that
+#       results depend on batch size but not on the number of jobs
+def simulateBatchExecutions(program, batchStartIndex, numBatchExecs, seed):
+    import batch_sim
+    config = program["config"]
+    if (config["verbosity"] > 0):
+        print("Executions %d-%d" % (batchStartIndex, batchStartIndex + numBatchExecs - 1))
+    return batch_sim.simulateBatch(program["compactProg"], config["numMemLocs"], config["numHistRegs"], config["numOutstandingOps"], numBatchExecs, getExecutionSeed(seed, batchStartIndex))
+
+# Simulate executions of a generated program
+# Yields (executionIndex, returnDict) in execution order
+#   returnDict["mem"][address]: final memory contents
+#   returnDict["history"][thread][target]: loaded values of history register, in the order they are loaded
+#   returnDict["loadValues"][flat]: loaded value of each load, indexed by flat instruction index (see compact_program.py)
+# NOTE: If seed is None, executions continue the random stream of program
+#       generation (same as gen_mtrand.py without --seed-per-exec). Otherwise,
+#       each execution uses its own seed derived from seed and its index.
+# NOTE: executionIndices (default: 0 -- numExecutions-1) is not supported by
+#       the batch scheduler, which always uses per-batch seeds.
+def simulate(program, numExecutions, seed=None, scheduler="window", executionIndices=None, batchSize=1024):
+    if (scheduler == "batch"):
+        assert(executionIndices == None)
+        if (seed == None):
+            seed = program["config"]["randSeed"]
+        for batchStartIndex in range(0, numExecutions, batchSize):
+            numBatchExecs = min(batchSize, numExecutions - batchStartIndex)
+            batchResults = simulateBatchExecutions(program, batchStartIndex, numBatchExecs, seed)
+            for i in range(numBatchExecs):
+                yield (batchStartIndex + i, batchResults[i])
+        return
+    if (executionIndices == None):
+        executionIndices = range(numExecutions)
+    for executionIndex in executionIndices:
+        if (seed == None):
+            rng = program["rng"]
+        else:
+            rng = random.Random(getExecutionSeed(seed, executionIndex))
+        yield (executionIndex, simulateExecutionWithScheduler(program, executionIndex, rng, scheduler))
+
+# Generate output strings of an execution (memory dump and load target history)
+# NOTE: numHistPerReg is the number of loaded values kept per history register (-1: unlimited)
+def generateOutputStrings(program, executionIndex, returnDict, numHistPerReg=-1, withDump=True):
+    config = program["config"]
+    numThreads = config["numThreads"]
+    numMemLocs = config["numMemLocs"]
+    numHistRegs = config["numHistRegs"]
+    mem = returnDict["mem"]
+    historyLoadTargets = returnDict["history"]
+
+    ############################################################
+    ## Generate output: memory dump
+    ############################################################
+    # NOTE: mem is None if there is no memory state (--exhaustive)
+    if (withDump and mem != None):
+        dumpString = "".join(["%08x\n" % mem[i] for i in range(numMemLocs)])
+    else:
+        dumpString = None
 
     ############################################################
     ## Generate output: load target history
     ############################################################
-    stringToWrite = "### Execution %d\n" % (executionIndex)
+    stringList = ["### Execution %d\n" % (executionIndex)]
     if (numHistPerReg > 0):
         for thread in range(numThreads):
             for target in range(numHistRegs):
@@ -695,24 +931,497 @@ for executionIndex in range(numExecutions):
         assert(numHistPerReg == -1)
         # Unlimited collection of values
     for thread in range(numThreads):
-        stringToWrite += ("T%d:" % (thread))
+        stringList.append("T%d:" % (thread))
         for target in range(numHistRegs):
-            stringToWrite += (" %d-" % (target))
-            for loadIndex in range(len(historyLoadTargets[thread][target])):
-                if (loadIndex != 0):
-                    stringToWrite += (",%X" % historyLoadTargets[thread][target][loadIndex])
-                else:
-                    stringToWrite += ("%X" % historyLoadTargets[thread][target][loadIndex])
-        stringToWrite += "\n"
+            stringList.append(" %d-" % (target))
+            stringList.append(",".join(["%X" % loadValue for loadValue in historyLoadTargets[thread][target]]))
+        stringList.append("\n")
 
-    histFileName = "%s/hist%d.txt" % (logDirPrefix, executionIndex)
-    histFP = open(histFileName, "w")
-    histFP.write(stringToWrite)
-    histFP.close()
+    return (executionIndex, dumpString, "".join(stringList))
 
-    histSummaryFP.write(stringToWrite)
+# Key of load-value history (used for deduplication)
+# NOTE: The history string without its "### Execution" line identifies
+#       historyLoadTargets of the execution (after --hist-per-reg is applied)
+def getHistoryKey(histString):
+    return histString[histString.index("\n")+1:]
 
-if (not args.no_dump_files):
-    dumpSummaryFP.close()
-histSummaryFP.close()
 
+############################################################
+## Command-line interface
+############################################################
+
+# Generated program and arguments of the command-line interface
+# NOTE: These are set in main() before worker processes are forked (see --jobs)
+cliProgram = None
+cliArgs = None
+cliSeedPerExec = False
+cliSignatureEncoder = None
+
+# Signature of an execution (see signature_encoder.py), None if not encoded or not profiled
+def encodeSignature(returnDict):
+    if (cliSignatureEncoder == None):
+        return None
+    return cliSignatureEncoder.encode(returnDict["loadValues"])
+
+# Simulate an execution and generate its output strings
+# NOTE: This function is also called in worker processes (see --jobs)
+def runExecution(executionIndex):
+    if (cliSeedPerExec):
+        rng = random.Random(getExecutionSeed(cliArgs.rand_seed, executionIndex))
+    else:
+        rng = cliProgram["rng"]
+    returnDict = simulateExecutionWithScheduler(cliProgram, executionIndex, rng, cliArgs.scheduler)
+    (executionIndex, dumpString, histString) = generateOutputStrings(cliProgram, executionIndex, returnDict, cliArgs.hist_per_reg, not cliArgs.no_dump_files)
+    return (executionIndex, dumpString, histString, encodeSignature(returnDict))
+
+# Simulate a batch of executions in lockstep (--scheduler=batch) and generate their output strings
+def runBatch(batchStartIndex):
+    numBatchExecs = min(cliArgs.batch_size, cliArgs.execs - batchStartIndex)
+    batchResults = simulateBatchExecutions(cliProgram, batchStartIndex, numBatchExecs, cliArgs.rand_seed)
+    return [generateOutputStrings(cliProgram, batchStartIndex + i, batchResults[i], cliArgs.hist_per_reg, not cliArgs.no_dump_files) + (encodeSignature(batchResults[i]),) for i in range(numBatchExecs)]
+
+def main():
+    global cliProgram
+    global cliArgs
+    global cliSeedPerExec
+    global cliSignatureEncoder
+
+    ############################################################
+    ## Processing command line arguments
+    ############################################################
+    parser = argparse.ArgumentParser(description="Arguments for %s" % __file__)
+    parser.add_argument("--verbose", "-v", action="count", default=0)
+    parser.add_argument("--debug", "-d", action="store_true", default=False)
+    parser.add_argument("--rand-seed", type=int, help="random seed", default=894291)
+    parser.add_argument("--threads", "-t", type=int, help="number of threads to be generated", default=2)
+    parser.add_argument("--insts", "-i", type=int, help="number of memory operations to be generated for each thread", default=10)
+    parser.add_argument("--locs", "-l", type=int, help="number of memory target locations", default=4)
+    parser.add_argument("--outstanding", "-o", type=int, help="number of outstanding memory operations for each thread (-1: entire range)", default=-1)
+    parser.add_argument("--execs", "-e", type=int, help="number of executions", default=10)
+    parser.add_argument("--hist-regs", type=int, help="number of registers to save loaded value", default=16)
+    parser.add_argument("--hist-per-reg", type=int, help="number of loaded values per history register (-1: unlimited)", default=-1)
+    parser.add_argument("--log-dir", help="directory to save individual log files", default="log")
+    parser.add_argument("--summary-dir", help="directory to save summary files (e.g., md5 hashes)", default=None)
+    parser.add_argument("--consistency-model", help="consistency model", default="sc")
+    parser.add_argument("--single-copy-atomicity", action="store_true", default=False)
+    parser.add_argument("--gen-program", action="store_true", help="generate intermediate file that represents a generated multi-threaded program, with intra-thread dependency annotated", default=False)
+    parser.add_argument("--prog-file", help="intermediate program file name", default="prog.txt")
+    parser.add_argument("--wo-file", help="intermediate write-order file name", default="wo.txt")
+    parser.add_argument("--no-dump-files", action="store_true", help="do not generate memory dump files", default=False)
+    parser.add_argument("--with-fences", action="store_true", default=False)
+    parser.add_argument("--bulk-sampling", action="store_true", help="draw instruction types, addresses, and load targets in bulk for each thread (faster generation, but a different program for the same --rand-seed)", default=False)
+    parser.add_argument("--no-log-files", action="store_true", help="do not generate individual log files (hist%%d.txt, dump%%d.txt) in --log-dir, only summary files", default=False)
+    parser.add_argument("--dedup", action="store_true", help="output only executions with unique load-value histories, and their occurrence counts (see --count-file)", default=False)
+    parser.add_argument("--count-file", help="occurrence counts of unique load-value histories (--dedup, --exhaustive), saved in --summary-dir", default="hist_count.txt")
+    parser.add_argument("--stop-when-saturated", type=int, help="stop after this number of consecutive executions without a new unique load-value history", default=None)
+    parser.add_argument("--min-discovery-rate", type=float, help="stop when the estimated probability of a new unique history (histories seen once / executions) falls below this rate, checked every --discovery-interval executions", default=None)
+    parser.add_argument("--discovery-interval", type=int, help="number of executions between discovery-rate checks and discovery-file entries", default=100)
+    parser.add_argument("--discovery-file", help="CSV file of discovery curve (executions, unique histories, histories seen once, discovery rate), saved in --summary-dir", default=None)
+    parser.add_argument("--hist-archive", help="indexed archive file of load-value histories (see hist_archive.py)", default=None)
+    parser.add_argument("--jobs", "-j", type=int, help="number of worker processes simulating executions in parallel (implies --seed-per-exec if larger than 1)", default=1)
+    parser.add_argument("--seed-per-exec", action="store_true", help="derive an independent random seed for each execution from --rand-seed and execution index", default=False)
+    parser.add_argument("--only-execs", help="simulate only the specified executions (e.g., 87311,90000-90010), implies --seed-per-exec", default=None)
+    parser.add_argument("--scheduler", choices=["window", "event", "batch", "store-buffer"], help="instruction scheduler for simulation (window: rescan scheduling window, event: dependency counters, batch: lockstep simulation of executions with NumPy, store-buffer: per-thread store buffers drained by random events)", default="window")
+    parser.add_argument("--non-multi-copy-atomic", action="store_true", help="per-thread memory views, to which drained stores are propagated separately (--scheduler=store-buffer)", default=False)
+    parser.add_argument("--exhaustive", action="store_true", help="enumerate all load-value histories (instead of random executions), with the number of interleavings resulting in each history (see --count-file)", default=False)
+    parser.add_argument("--max-states", type=int, help="maximum number of simulation states to be explored (--exhaustive)", default=1000000)
+    parser.add_argument("--batch-size", type=int, help="number of executions simulated in lockstep (--scheduler=batch)", default=1024)
+    parser.add_argument("--profile-file", help="profile weight file written by codegen.py (--profile-file), to encode executions into signatures as the generated test code does", default=None)
+    parser.add_argument("--signature-file", help="signature log of simulated executions (--profile-file), saved in --summary-dir (same format as the test manager, see signature_decoder.py)", default="signature.txt")
+    parser.add_argument("--signature-reg-width", type=int, help="width of a signature word in bits (codegen.py --reg-width)", default=64)
+    parser.add_argument("--checkpoint-interval", type=int, help="number of executions between checkpoints, from which an interrupted run can be resumed (0: no checkpoint)", default=0)
+    parser.add_argument("--checkpoint-file", help="checkpoint file name, saved in --summary-dir (removed when the run completes)", default="checkpoint.pkl")
+    parser.add_argument("--resume", action="store_true", help="resume an interrupted run from its last checkpoint (same arguments as the interrupted run)", default=False)
+    args = parser.parse_args()
+
+    verbosity = args.verbose
+    numExecutions = args.execs
+    if (args.jobs < 1):
+        print("Error: Number of jobs should be positive (%d)" % args.jobs)
+        sys.exit(1)
+    # NOTE: Parallel simulation always uses per-execution seeds, so that
+    #       the results do not depend on the number of jobs
+    seedPerExec = args.seed_per_exec or (args.jobs > 1)
+    if (args.only_execs != None):
+        # Parse execution indices (e.g., --only-execs=87311,90000-90010)
+        # NOTE: Each of these executions is reproduced from its own seed,
+        #       without simulating preceding executions
+        executionIndices = set()
+        indexRanges = args.only_execs.split(",")
+        for eachIndexRange in indexRanges:
+            rangeMinMax = eachIndexRange.split("-")
+            if (len(rangeMinMax) == 1):
+                executionIndices.add(int(rangeMinMax[0]))
+            elif (len(rangeMinMax) == 2):
+                minIndex = int(rangeMinMax[0])
+                maxIndex = int(rangeMinMax[1]) + 1
+                for i in range(minIndex, maxIndex):
+                    executionIndices.add(i)
+            else:
+                print("Error: Unrecognized execution index range %s" % (eachIndexRange))
+                sys.exit(1)
+        executionIndices = sorted(executionIndices)
+        seedPerExec = True
+    else:
+        executionIndices = range(numExecutions)
+    if (args.scheduler == "batch"):
+        # NOTE: NumPy is required only for the batch scheduler
+        try:
+            import batch_sim
+        except ImportError:
+            print("Error: --scheduler=batch requires NumPy")
+            sys.exit(1)
+        if (args.only_execs != None):
+            print("Error: --only-execs is not supported with --scheduler=batch")
+            sys.exit(1)
+        if (args.batch_size < 1):
+            print("Error: Batch size should be positive (%d)" % args.batch_size)
+            sys.exit(1)
+    if (args.non_multi_copy_atomic and args.scheduler != "store-buffer"):
+        print("Error: --non-multi-copy-atomic requires --scheduler=store-buffer")
+        sys.exit(1)
+    if (args.checkpoint_interval < 0):
+        print("Error: Checkpoint interval should not be negative (%d)" % args.checkpoint_interval)
+        sys.exit(1)
+    if (args.scheduler == "batch" and args.checkpoint_interval % args.batch_size != 0):
+        print("Error: Checkpoint interval should be a multiple of batch size (%d)" % args.batch_size)
+        sys.exit(1)
+    if (args.exhaustive and args.profile_file != None):
+        print("Error: Signatures are not supported with --exhaustive")
+        sys.exit(1)
+    if (args.exhaustive and (args.checkpoint_interval > 0 or args.resume)):
+        print("Error: Checkpoints are not supported with --exhaustive")
+        sys.exit(1)
+    if (args.stop_when_saturated != None and args.stop_when_saturated < 1):
+        print("Error: --stop-when-saturated should be positive (%d)" % args.stop_when_saturated)
+        sys.exit(1)
+    if (args.discovery_interval < 1):
+        print("Error: Discovery interval should be positive (%d)" % args.discovery_interval)
+        sys.exit(1)
+    # NOTE: Unique histories are tracked for deduplication and saturation
+    trackHistories = args.dedup or (args.stop_when_saturated != None) or (args.min_discovery_rate != None) or (args.discovery_file != None)
+    if (args.log_dir == None):
+        logDirPrefix = "."
+    elif (args.log_dir[-1] != "/"):
+        logDirPrefix = args.log_dir
+    else: # Remove "/" at the end of string
+        logDirPrefix = args.log_dir[:-1]
+    if (args.summary_dir == None):
+        summaryDirPrefix = "."
+    elif (args.summary_dir[-1] != "/"):
+        summaryDirPrefix = args.summary_dir
+    else:
+        summaryDirPrefix = args.summary_dir[:-1]
+
+    if (not args.no_log_files and not os.path.exists(logDirPrefix)):
+        os.makedirs(logDirPrefix)
+    if not os.path.exists(summaryDirPrefix):
+        os.makedirs(summaryDirPrefix)
+
+    ############################################################
+    ## Generate random test program
+    ############################################################
+    config = getDefaultConfig()
+    config["numThreads"] = args.threads
+    config["numInsts"] = args.insts
+    config["numMemLocs"] = args.locs
+    config["numOutstandingOps"] = args.outstanding
+    config["numHistRegs"] = args.hist_regs
+    config["consistencyModel"] = args.consistency_model
+    config["singleCopyAtomicity"] = args.single_copy_atomicity
+    config["withFences"] = args.with_fences
+    config["bulkSampling"] = args.bulk_sampling
+    config["multiCopyAtomicity"] = not args.non_multi_copy_atomic
+    config["randSeed"] = args.rand_seed
+    config["verbosity"] = verbosity
+    config["debug"] = args.debug
+    program = generateProgram(config)
+
+    if (args.gen_program):
+        progFileName = "%s/%s" % (summaryDirPrefix, args.prog_file)
+        woFileName = "%s/%s" % (summaryDirPrefix, args.wo_file)
+        writeProgramFiles(program, progFileName, woFileName)
+
+    cliProgram = program
+    cliArgs = args
+    cliSeedPerExec = seedPerExec
+    if (args.profile_file != None):
+        cliSignatureEncoder = signature_encoder.SignatureEncoder(program["compactProg"], args.profile_file)
+
+    ############################################################
+    ## Exhaustive enumeration (instead of random executions)
+    ############################################################
+    if (args.exhaustive):
+        try:
+            (outcomes, numStates) = exhaustive_sim.enumerateOutcomes(program["compactProg"], args.locs, args.hist_regs, program["config"]["numOutstandingOps"], args.max_states)
+        except exhaustive_sim.StateLimitExceeded:
+            print("Error: Number of simulation states exceeds %d (see --max-states)" % args.max_states)
+            sys.exit(1)
+        if (verbosity > 0):
+            print("Explored %d states" % numStates)
+
+        # NOTE: Histories are numbered in sorted order, and histories that become
+        #       identical after --hist-per-reg is applied are merged
+        uniqueHistories = dict()
+        uniqueHistStrings = []
+        numInterleavings = 0
+        for history in sorted(outcomes.keys()):
+            historyLoadTargets = [[list(history[thread * args.hist_regs + target]) for target in range(args.hist_regs)] for thread in range(args.threads)]
+            (executionIndex, dumpString, histString) = generateOutputStrings(program, len(uniqueHistStrings), {"mem": None, "history": historyLoadTargets}, args.hist_per_reg, False)
+            historyKey = getHistoryKey(histString)
+            if (historyKey in uniqueHistories):
+                uniqueHistories[historyKey][1] += outcomes[history]
+            else:
+                uniqueHistories[historyKey] = [executionIndex, outcomes[history]]
+                uniqueHistStrings.append(histString)
+            numInterleavings += outcomes[history]
+
+        histSummaryFileName = "%s/hist.txt" % (summaryDirPrefix)
+        histSummaryFP = open(histSummaryFileName, "w")
+        histSummaryFP.write("".join(uniqueHistStrings))
+        histSummaryFP.close()
+        countFileName = "%s/%s" % (summaryDirPrefix, args.count_file)
+        countFP = open(countFileName, "w")
+        for uniqueHistory in sorted(uniqueHistories.values()):
+            countFP.write("%d: %d\n" % (uniqueHistory[0], uniqueHistory[1]))
+        countFP.write("Number of unique results %d out of %d\n" % (len(uniqueHistories), numInterleavings))
+        countFP.close()
+        print("Number of unique results %d out of %d interleavings" % (len(uniqueHistories), numInterleavings))
+        return
+
+    ############################################################
+    ## Checkpoint (resume an interrupted run)
+    ############################################################
+    # NOTE: A checkpoint holds the state after numProcessedExecs executions:
+    #       random state (unless executions have their own seeds), unique
+    #       histories, and offsets of summary files. Output written after the
+    #       checkpoint is discarded when the run is resumed, so that the final
+    #       output is identical to an uninterrupted run.
+    checkpointFileName = "%s/%s" % (summaryDirPrefix, args.checkpoint_file)
+    # Arguments that should be the same as the interrupted run
+    checkpointArgs = dict(vars(args))
+    for argName in ["verbose", "debug", "jobs", "checkpoint_interval", "checkpoint_file", "resume"]:
+        del checkpointArgs[argName]
+    if (args.scheduler != "batch"):
+        # NOTE: Random choices depend on --jobs (see seedPerExec) except for batches
+        checkpointArgs["seed_per_exec"] = seedPerExec
+    if (args.resume):
+        if (not os.path.exists(checkpointFileName)):
+            print("Error: Checkpoint file %s does not exist" % (checkpointFileName))
+            sys.exit(1)
+        checkpointFP = open(checkpointFileName, "rb")
+        checkpoint = pickle.load(checkpointFP)
+        checkpointFP.close()
+        if (checkpoint["args"] != checkpointArgs):
+            print("Error: Checkpoint file %s was saved with different arguments" % (checkpointFileName))
+            sys.exit(1)
+        if ("rngState" in checkpoint):
+            program["rng"].setstate(checkpoint["rngState"])
+        if (verbosity > 0):
+            print("Resume after %d executions" % (checkpoint["numProcessedExecs"]))
+    else:
+        checkpoint = None
+
+    # Open a summary file, truncated to its offset at the checkpoint (if resumed)
+    def openSummaryFile(fileName, bufferSize, offsetName):
+        if (checkpoint == None):
+            return open(fileName, "w", bufferSize)
+        summaryFP = open(fileName, "r+", bufferSize)
+        summaryFP.seek(checkpoint[offsetName])
+        summaryFP.truncate()
+        return summaryFP
+
+    ############################################################
+    ## Execution iteration loop
+    ############################################################
+    # NOTE: Summary files are written through large buffers
+    summaryBufferSize = 1 << 20
+    if (not args.no_dump_files):
+        dumpSummaryFileName = "%s/dump.txt" % (summaryDirPrefix)
+        dumpSummaryFP = openSummaryFile(dumpSummaryFileName, summaryBufferSize, "dumpOffset")
+    histSummaryFileName = "%s/hist.txt" % (summaryDirPrefix)
+    histSummaryFP = openSummaryFile(histSummaryFileName, summaryBufferSize, "histOffset")
+    if (args.hist_archive != None):
+        if (checkpoint == None):
+            histArchive = hist_archive.HistoryArchiveWriter(args.hist_archive)
+        else:
+            histArchive = hist_archive.HistoryArchiveWriter(args.hist_archive, checkpoint["archive"])
+    if (checkpoint == None):
+        # uniqueHistories[key] = [first-seen execution index, number of occurrences]
+        uniqueHistories = dict()
+        numProcessedExecs = 0
+        numExecsSinceNewHistory = 0
+        numSingleHistories = 0  # number of histories seen only once
+        # signatureCounts[signature] = number of occurrences (--profile-file)
+        signatureCounts = dict()
+        numInvalidSignatures = 0  # number of executions with a load value not profiled
+    else:
+        uniqueHistories = checkpoint["uniqueHistories"]
+        numProcessedExecs = checkpoint["numProcessedExecs"]
+        numExecsSinceNewHistory = checkpoint["numExecsSinceNewHistory"]
+        numSingleHistories = checkpoint["numSingleHistories"]
+        signatureCounts = checkpoint["signatureCounts"]
+        numInvalidSignatures = checkpoint["numInvalidSignatures"]
+    saturated = False
+    if (args.discovery_file != None):
+        discoveryFileName = "%s/%s" % (summaryDirPrefix, args.discovery_file)
+        discoveryFP = openSummaryFile(discoveryFileName, -1, "discoveryOffset")
+        if (checkpoint == None):
+            discoveryFP.write("executions,unique,singletons,discovery_rate\n")
+
+    # Write a checkpoint after numProcessedExecs executions
+    # NOTE: The checkpoint file is replaced atomically (written to a temporary file first)
+    def writeCheckpoint():
+        newCheckpoint = {"args": checkpointArgs, "numProcessedExecs": numProcessedExecs,
+                         "uniqueHistories": uniqueHistories, "numExecsSinceNewHistory": numExecsSinceNewHistory, "numSingleHistories": numSingleHistories,
+                         "signatureCounts": signatureCounts, "numInvalidSignatures": numInvalidSignatures}
+        if (not seedPerExec):
+            newCheckpoint["rngState"] = program["rng"].getstate()
+        for (offsetName, summaryFP) in [("dumpOffset", None if args.no_dump_files else dumpSummaryFP), ("histOffset", histSummaryFP),
+                                        ("discoveryOffset", None if args.discovery_file == None else discoveryFP)]:
+            if (summaryFP != None):
+                summaryFP.flush()
+                os.fsync(summaryFP.fileno())
+                newCheckpoint[offsetName] = summaryFP.tell()
+        if (args.hist_archive != None):
+            newCheckpoint["archive"] = histArchive.getCheckpoint()
+        tempFileName = checkpointFileName + ".tmp"
+        tempFP = open(tempFileName, "wb")
+        pickle.dump(newCheckpoint, tempFP, 2)
+        tempFP.flush()
+        os.fsync(tempFP.fileno())
+        tempFP.close()
+        os.rename(tempFileName, checkpointFileName)
+        if (verbosity > 0):
+            print("Checkpoint after %d executions" % (numProcessedExecs))
+
+    # Write output files of an execution
+    # NOTE: Summary files are written in execution order, so this is called only in the main process
+    def writeExecutionOutput(executionIndex, dumpString, histString):
+        if (dumpString != None):
+            if (not args.no_log_files):
+                dumpFileName = "%s/dump%d.txt" % (logDirPrefix, executionIndex)
+                dumpFP = open(dumpFileName, "w")
+                dumpFP.write(dumpString)
+                dumpFP.close()
+
+            dumpSummaryFP.write("### Execution %d\n" % (executionIndex))
+            dumpSummaryFP.write(dumpString)
+
+        if (not args.no_log_files):
+            histFileName = "%s/hist%d.txt" % (logDirPrefix, executionIndex)
+            histFP = open(histFileName, "w")
+            histFP.write(histString)
+            histFP.close()
+
+        histSummaryFP.write(histString)
+        if (args.hist_archive != None):
+            histArchive.addHistory(executionIndex, histString)
+
+    # NOTE: Executions processed before the checkpoint are skipped (if resumed)
+    executionIndices = executionIndices[numProcessedExecs:]
+    if (args.jobs > 1):
+        # Worker processes are forked after the program is generated, so that they
+        # share the generated program. Results are returned in execution order.
+        pool = multiprocessing.Pool(args.jobs)
+        if (args.scheduler == "batch"):
+            batchResults = pool.imap(runBatch, range(numProcessedExecs, numExecutions, args.batch_size))
+        else:
+            chunkSize = max(1, min(64, len(executionIndices) // (args.jobs * 4)))
+            results = pool.imap(runExecution, executionIndices, chunkSize)
+    else:
+        pool = None
+        if (args.scheduler == "batch"):
+            batchResults = (runBatch(batchStartIndex) for batchStartIndex in range(numProcessedExecs, numExecutions, args.batch_size))
+        else:
+            results = (runExecution(executionIndex) for executionIndex in executionIndices)
+    if (args.scheduler == "batch"):
+        results = (result for batchResult in batchResults for result in batchResult)
+
+    for (executionIndex, dumpString, histString, signature) in results:
+        numProcessedExecs += 1
+        if (args.profile_file != None):
+            if (signature == None):
+                numInvalidSignatures += 1
+            elif (signature in signatureCounts):
+                signatureCounts[signature] += 1
+            else:
+                signatureCounts[signature] = 1
+        isNewHistory = True
+        if (trackHistories):
+            historyKey = getHistoryKey(histString)
+            if (historyKey in uniqueHistories):
+                uniqueHistories[historyKey][1] += 1
+                if (uniqueHistories[historyKey][1] == 2):
+                    numSingleHistories -= 1
+                isNewHistory = False
+                numExecsSinceNewHistory += 1
+            else:
+                uniqueHistories[historyKey] = [executionIndex, 1]
+                numSingleHistories += 1
+                numExecsSinceNewHistory = 0
+
+            ## Saturation check
+            # NOTE: Discovery rate is estimated as the fraction of executions whose
+            #       history was seen only once (Good-Turing estimate)
+            if (args.stop_when_saturated != None and numExecsSinceNewHistory >= args.stop_when_saturated):
+                saturated = True
+            if (numProcessedExecs % args.discovery_interval == 0):
+                discoveryRate = float(numSingleHistories) / numProcessedExecs
+                if (args.discovery_file != None):
+                    discoveryFP.write("%d,%d,%d,%f\n" % (numProcessedExecs, len(uniqueHistories), numSingleHistories, discoveryRate))
+                if (args.min_discovery_rate != None and discoveryRate < args.min_discovery_rate):
+                    saturated = True
+
+        if (isNewHistory or not args.dedup):
+            writeExecutionOutput(executionIndex, dumpString, histString)
+        if (saturated):
+            print("Info: Stopped after %d executions (%d unique histories)" % (numProcessedExecs, len(uniqueHistories)))
+            break
+        if (args.checkpoint_interval > 0 and numProcessedExecs % args.checkpoint_interval == 0):
+            writeCheckpoint()
+
+    if (pool != None):
+        if (saturated):
+            pool.terminate()
+        else:
+            pool.close()
+        pool.join()
+
+    if (not args.no_dump_files):
+        dumpSummaryFP.close()
+    histSummaryFP.close()
+    if (args.hist_archive != None):
+        histArchive.close()
+    if (args.discovery_file != None):
+        if (numProcessedExecs % args.discovery_interval != 0):
+            discoveryRate = float(numSingleHistories) / max(1, numProcessedExecs)
+            discoveryFP.write("%d,%d,%d,%f\n" % (numProcessedExecs, len(uniqueHistories), numSingleHistories, discoveryRate))
+        discoveryFP.close()
+
+    if (args.dedup):
+        # Format (similar to signature logs of test managers)
+        # <first-seen execution index>: <number of occurrences>
+        countFileName = "%s/%s" % (summaryDirPrefix, args.count_file)
+        countFP = open(countFileName, "w")
+        for uniqueHistory in sorted(uniqueHistories.values()):
+            countFP.write("%d: %d\n" % (uniqueHistory[0], uniqueHistory[1]))
+        countFP.write("Number of unique results %d out of %d\n" % (len(uniqueHistories), numProcessedExecs))
+        countFP.close()
+        if (verbosity > 0):
+            print("Number of unique results %d out of %d" % (len(uniqueHistories), numProcessedExecs))
+
+    if (args.profile_file != None):
+        signatureFileName = "%s/%s" % (summaryDirPrefix, args.signature_file)
+        signature_encoder.writeSignatureLog(signatureFileName, signatureCounts, numProcessedExecs, args.signature_reg_width)
+        if (numInvalidSignatures > 0):
+            print("Warning: %d executions have a load value not in profile file %s (excluded from signatures)" % (numInvalidSignatures, args.profile_file))
+        if (verbosity > 0):
+            print("Number of unique signatures %d out of %d" % (len(signatureCounts), numProcessedExecs))
+
+    # The run is complete, so it is not resumed from the checkpoint any more
+    if (os.path.exists(checkpointFileName) and (args.checkpoint_interval > 0 or args.resume)):
+        os.remove(checkpointFileName)
+
+if __name__ == "__main__":
+    main()
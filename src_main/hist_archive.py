@@ -0,0 +1,171 @@
+#!/usr/bin/python
+
+##########################################################################
+#
+# MTraceCheck
+# Copyright 2017 The Regents of the University of Michigan
+# Doowon Lee and Valeria Bertacco
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+##########################################################################
+
+#
+# Indexed archive of load-value histories (one file for all executions)
+#
+
+import os
+import sys
+import struct
+import argparse
+
+""" Archive format
+<header> "MTraceCheck history archive\n"
+<record> history of an execution, same as hist%d.txt (e.g., "### Execution 0\nT0: 0-1 1-FFFF0000 ...\n")
+<record> ...
+<index>  for each record, (execution index, offset, length) packed as 3 unsigned 64-bit integers (little endian)
+<footer> (index offset, number of records) packed as 2 unsigned 64-bit integers, followed by magic "MTHARCH1"
+"""
+
+ARCHIVE_HEADER = b"MTraceCheck history archive\n"
+ARCHIVE_MAGIC = b"MTHARCH1"
+INDEX_ENTRY_FORMAT = "<QQQ"
+FOOTER_FORMAT = "<QQ8s"
+
+class HistoryArchiveWriter:
+
+    ## Class variables
+    # archiveFP: archive file (records are written as they are added)
+    # offset: offset of next record
+    # indexEntries: list of (execution index, offset, length)
+
+    def __init__(self, archiveFileName, checkpoint=None):
+        if (checkpoint == None):
+            self.archiveFP = open(archiveFileName, "wb")
+            self.archiveFP.write(ARCHIVE_HEADER)
+            self.offset = len(ARCHIVE_HEADER)
+            self.indexEntries = []
+        else:
+            # Resume writing an archive (see getCheckpoint()), discarding records added after the checkpoint
+            (self.offset, indexEntries) = checkpoint
+            self.archiveFP = open(archiveFileName, "r+b")
+            self.archiveFP.seek(self.offset)
+            self.archiveFP.truncate()
+            self.indexEntries = list(indexEntries)
+
+    def addHistory(self, executionIndex, histString):
+        record = histString.encode("ascii")
+        self.archiveFP.write(record)
+        self.indexEntries.append((executionIndex, self.offset, len(record)))
+        self.offset += len(record)
+
+    def getCheckpoint(self):
+        # Records added so far are flushed to the archive file
+        self.archiveFP.flush()
+        os.fsync(self.archiveFP.fileno())
+        return (self.offset, self.indexEntries)
+
+    def close(self):
+        indexOffset = self.offset
+        indexStrings = [struct.pack(INDEX_ENTRY_FORMAT, *indexEntry) for indexEntry in self.indexEntries]
+        self.archiveFP.write(b"".join(indexStrings))
+        self.archiveFP.write(struct.pack(FOOTER_FORMAT, indexOffset, len(self.indexEntries), ARCHIVE_MAGIC))
+        self.archiveFP.close()
+
+
+class HistoryArchiveReader:
+
+    ## Class variables
+    # archiveFP: archive file
+    # index[executionIndex]: (offset, length) of record
+
+    def __init__(self, archiveFileName):
+        self.archiveFP = open(archiveFileName, "rb")
+        footerSize = struct.calcsize(FOOTER_FORMAT)
+        self.archiveFP.seek(-footerSize, os.SEEK_END)
+        (indexOffset, numRecords, magic) = struct.unpack(FOOTER_FORMAT, self.archiveFP.read(footerSize))
+        if (magic != ARCHIVE_MAGIC):
+            print("Error: %s is not a history archive (or it was not closed properly)" % (archiveFileName))
+            sys.exit(1)
+        entrySize = struct.calcsize(INDEX_ENTRY_FORMAT)
+        self.archiveFP.seek(indexOffset)
+        indexString = self.archiveFP.read(entrySize * numRecords)
+        self.index = dict()
+        for i in range(numRecords):
+            (executionIndex, offset, length) = struct.unpack_from(INDEX_ENTRY_FORMAT, indexString, i * entrySize)
+            self.index[executionIndex] = (offset, length)
+
+    def getExecutionIndices(self):
+        return sorted(self.index.keys())
+
+    def getHistory(self, executionIndex):
+        (offset, length) = self.index[executionIndex]
+        self.archiveFP.seek(offset)
+        return self.archiveFP.read(length).decode("ascii")
+
+    def close(self):
+        self.archiveFP.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Arguments for %s" % __file__)
+    parser.add_argument("--verbose", "-v", action="count", default=0)
+    parser.add_argument("--list", action="store_true", help="list execution indices in archive", default=False)
+    parser.add_argument("--execs", help="executions to be extracted (e.g., 0,2-4,10), all executions if not specified", default=None)
+    parser.add_argument("--output-dir", help="directory to save extracted history files (hist%%d.txt), standard output if not specified", default=None)
+    parser.add_argument("input", metavar="archive file", help="history archive to be processed")
+    args = parser.parse_args()
+
+    reader = HistoryArchiveReader(args.input)
+    if (args.list):
+        for executionIndex in reader.getExecutionIndices():
+            print("%d" % executionIndex)
+        reader.close()
+        sys.exit(0)
+
+    if (args.execs != None):
+        # e.g., --execs=0,2-4,10
+        executionIndices = []
+        indexRanges = args.execs.split(",")
+        for eachIndexRange in indexRanges:
+            rangeMinMax = eachIndexRange.split("-")
+            if (len(rangeMinMax) == 1):
+                executionIndices.append(int(rangeMinMax[0]))
+            elif (len(rangeMinMax) == 2):
+                minIndex = int(rangeMinMax[0])
+                maxIndex = int(rangeMinMax[1]) + 1
+                for i in range(minIndex, maxIndex):
+                    executionIndices.append(i)
+            else:
+                print("Error: Unrecognized execution index range %s" % (eachIndexRange))
+                sys.exit(1)
+    else:
+        executionIndices = reader.getExecutionIndices()
+
+    if (args.output_dir != None and not os.path.exists(args.output_dir)):
+        os.makedirs(args.output_dir)
+    for executionIndex in executionIndices:
+        if (not executionIndex in reader.index):
+            print("Error: Execution %d not found in %s" % (executionIndex, args.input))
+            sys.exit(1)
+        histString = reader.getHistory(executionIndex)
+        if (args.output_dir != None):
+            histFileName = "%s/hist%d.txt" % (args.output_dir, executionIndex)
+            histFP = open(histFileName, "w")
+            histFP.write(histString)
+            histFP.close()
+            if (args.verbose > 0):
+                print("Extracted %s" % (histFileName))
+        else:
+            sys.stdout.write(histString)
+    reader.close()
@@ -24,6 +24,24 @@ import os
 import sys
 import instruction
 
+# Successors of stores in write order, for from-reads dependencies without searching write order
+# writeOrder[thread][address]: store instruction indices in write order (see parseProgram())
+# Returns (nextStore, firstStore)
+#   nextStore[memOp]: memOp of the next store to the same address of the thread (None if last)
+#   firstStore[thread][address]: memOp of the first store to the address of the thread
+def getWriteOrderSuccessors(writeOrder):
+    nextStore = dict()
+    firstStore = dict()
+    for thread in writeOrder:
+        firstStore[thread] = dict()
+        for address in writeOrder[thread]:
+            storeMemOps = [instruction.getMemOp(thread, inst) for inst in writeOrder[thread][address]]
+            firstStore[thread][address] = storeMemOps[0]
+            for i in range(len(storeMemOps) - 1):
+                nextStore[storeMemOps[i]] = storeMemOps[i+1]
+            nextStore[storeMemOps[-1]] = None
+    return (nextStore, firstStore)
+
 def parseProgram(program_file, wo_file, ignoreReg, verbosity):
     progFP = open(program_file, "r")
     prog = dict()
@@ -118,4 +136,6 @@ def parseProgram(program_file, wo_file, ignoreReg, verbosity):
             for address in writeOrder[thread]:
                 print("Address 0x%X: %s" % (address, writeOrder[thread][address]))
 
-    return {"progInfo": prog, "intraDep": intra, "writeOrder": writeOrder, "lookupTable": lookupInstFromLoad, "storeTable": storeTable}
+    (nextStore, firstStore) = getWriteOrderSuccessors(writeOrder)
+
+    return {"progInfo": prog, "intraDep": intra, "writeOrder": writeOrder, "nextStore": nextStore, "firstStore": firstStore, "lookupTable": lookupInstFromLoad, "storeTable": storeTable}
@@ -0,0 +1,101 @@
+##########################################################################
+#
+# MTraceCheck
+# Copyright 2017 The Regents of the University of Michigan
+# Doowon Lee and Valeria Bertacco
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+##########################################################################
+
+#
+# Encoding of simulated executions into execution signatures (gen_mtrand.py --profile-file)
+#
+# NOTE: A signature is computed as the generated test code does on-device
+#       (see codegen_x86.py): each load is followed by a profile statement,
+#       which adds the weight of its loaded value to the signature word of
+#       its thread. Weights are read from the profile file written by
+#       codegen.py (--profile-file), so that signatures of simulated
+#       executions can be compared with signatures from silicon.
+#       Signature logs are in the format of the test manager (see
+#       codegen_common.py), which signature_decoder.py reads.
+#
+
+import sys
+import parse_weight
+
+class SignatureEncoder:
+
+    ## Class variables
+    # numWords: number of signature words (numThreads * numWordsPerThread)
+    # loadFlats[i], wordIndices[i], weightMaps[i]: profile statement i (flat index of
+    #   its load, index of signature word, weightMaps[i][loaded value] = weight)
+
+    def __init__(self, compactProg, profileFileName):
+        returnDict = parse_weight.parseWeights(profileFileName)
+        weightList = returnDict["weightList"]
+        numThreads = returnDict["numThreads"]
+        numWordsPerThread = returnDict["numWordsPerThread"]
+        if (numThreads != compactProg.numThreads or len(weightList) != numThreads * numWordsPerThread):
+            print("Error: Profile file %s does not match the number of threads (%d)" % (profileFileName, compactProg.numThreads))
+            sys.exit(1)
+        self.numWords = numThreads * numWordsPerThread
+        self.loadFlats = []
+        self.wordIndices = []
+        self.weightMaps = []
+        for thread in range(numThreads):
+            # Profile statements follow loads of thread in program order
+            loadFlats = [flat for flat in range(compactProg.threadStart[thread], compactProg.threadStart[thread+1]) if compactProg.instType[flat] == 0]
+            profiles = [(wordIdx, profile[2]) for wordIdx in range(thread * numWordsPerThread, (thread + 1) * numWordsPerThread) for profile in weightList[wordIdx]]
+            if (len(profiles) != len(loadFlats)):
+                print("Error: Profile file %s does not match loads of thread %d (%d profile statements, %d loads)" % (profileFileName, thread, len(profiles), len(loadFlats)))
+                sys.exit(1)
+            for (loadFlat, (wordIdx, weightTargetString)) in zip(loadFlats, profiles):
+                # e.g., 0x0:0xFFFF0002/0x1:0x3/0x2:0x10004
+                weightMap = dict()
+                for weightTargetPair in weightTargetString.split("/"):
+                    tokens = weightTargetPair.split(":")
+                    assert(len(tokens) == 2)
+                    weightMap[int(tokens[1], 16)] = int(tokens[0], 16)
+                self.loadFlats.append(loadFlat)
+                self.wordIndices.append(wordIdx)
+                self.weightMaps.append(weightMap)
+
+    # Signature of an execution (tuple of signature words)
+    # loadValues[flat]: loaded value of each load (see gen_mtrand.py simulate())
+    # Returns None if a loaded value is not profiled (the test code would assert)
+    def encode(self, loadValues):
+        signature = [0] * self.numWords
+        wordIndices = self.wordIndices
+        weightMaps = self.weightMaps
+        i = 0
+        for flat in self.loadFlats:
+            weight = weightMaps[i].get(loadValues[flat])
+            if (weight == None):
+                return None
+            signature[wordIndices[i]] += weight
+            i += 1
+        return tuple(signature)
+
+
+# Write a signature log
+# signatureCounts[signature]: number of occurrences
+# NOTE: Signatures are sorted as in the test manager (std::map of signature vectors)
+def writeSignatureLog(signatureFileName, signatureCounts, numExecutions, regBitWidth):
+    wordFormat = " 0x%%0%dx" % (regBitWidth // 4)
+    signatureFP = open(signatureFileName, "w")
+    for signature in sorted(signatureCounts.keys()):
+        signatureFP.write("".join([wordFormat % word for word in signature]))
+        signatureFP.write(": %d\n" % (signatureCounts[signature]))
+    signatureFP.write("Number of unique results %d out of %d\n" % (len(signatureCounts), numExecutions))
+    signatureFP.close()
@@ -0,0 +1,244 @@
+##########################################################################
+#
+# MTraceCheck
+# Copyright 2017 The Regents of the University of Michigan
+# Doowon Lee and Valeria Bertacco
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+##########################################################################
+
+#
+# Operational simulation with per-thread store buffers (gen_mtrand.py --scheduler=store-buffer)
+#
+# NOTE: Instructions are issued as in the event-driven scheduler (intra-thread
+#       dependencies of the generated program, scheduling window), but an
+#       issued store is placed in a per-thread FIFO store buffer instead of
+#       memory. A load reads the youngest store to the same address in its
+#       own store buffer (store-to-load forwarding), or memory otherwise.
+#       Store buffers are drained in FIFO order by drain events, which are
+#       chosen randomly alongside instruction issue. A fence is performed
+#       after draining the store buffer of its thread.
+#       With an SC program (all intra-thread orders), this is TSO (x86).
+#
+# NOTE: Multiple-copy atomicity (default): a drained store is written to a
+#       single memory, seen by all threads at once.
+#       Non-multiple-copy atomicity: each thread has its own memory view.
+#       A drained store is written to the view of its thread, and propagated
+#       to each of the other threads by a separate propagation event.
+#       Propagations to a thread are in coherence order (drain order) for
+#       each address, and a propagated store older than the store in the view
+#       is discarded, so that all threads agree on coherence order.
+#       Fences do not wait for propagations (non-cumulative).
+#
+
+import collections
+import array
+import instruction
+
+class StoreBufferSimulator:
+
+    ## Class variables
+    # compactProg: program (see compact_program.py)
+    # numMemLocs, numHistRegs, numOutstandingOps: see gen_mtrand.py
+    # multiCopyAtomic: False for per-thread memory views (see above)
+    # Per-thread, per-address state is indexed by (thread * numMemLocs + address)
+    #   bufferedCount[index]: number of stores to address in store buffer of thread
+    #   bufferedValue[index]: value of the youngest store to address in store buffer of thread
+    #   view[index], viewSerial[index]: memory view of thread and coherence serial number of its value (non-multiple-copy atomicity)
+    #   propQueues[index]: (serial, value) of stores to be propagated to thread, in coherence order
+
+    def __init__(self, compactProg, numMemLocs, numHistRegs, numOutstandingOps, multiCopyAtomic=True):
+        self.compactProg = compactProg
+        self.numMemLocs = numMemLocs
+        self.numHistRegs = numHistRegs
+        self.numOutstandingOps = numOutstandingOps
+        self.multiCopyAtomic = multiCopyAtomic
+        numThreads = compactProg.numThreads
+        self.initPendingDeps = array.array('l', [compactProg.intraDepPtr[flat+1] - compactProg.intraDepPtr[flat] for flat in range(compactProg.numInsts)])
+        self.initMem = array.array('l', [instruction.getMemOp(0xffff, i) for i in range(numMemLocs)])
+        self.pendingDeps = array.array('l', self.initPendingDeps)
+        self.mem = array.array('l', self.initMem)
+        self.bufferedCount = array.array('l', [0] * (numThreads * numMemLocs))
+        self.bufferedValue = array.array('l', [0] * (numThreads * numMemLocs))
+        self.storeBuffers = [collections.deque() for thread in range(numThreads)]
+        self.initView = array.array('l', self.initMem * numThreads)
+        self.view = array.array('l', self.initView)
+        self.viewSerial = array.array('l', [0] * (numThreads * numMemLocs))
+        self.propQueues = [collections.deque() for i in range(numThreads * numMemLocs)]
+
+    def reset(self):
+        self.pendingDeps[:] = self.initPendingDeps
+        self.mem[:] = self.initMem
+        self.view[:] = self.initView
+        for i in range(len(self.bufferedCount)):
+            self.bufferedCount[i] = 0
+            self.viewSerial[i] = 0
+        for storeBuffer in self.storeBuffers:
+            storeBuffer.clear()
+        for propQueue in self.propQueues:
+            propQueue.clear()
+
+    # Simulate an execution
+    # Returns {"mem": final memory contents, "history": load-value history, "loadValues": loaded values} (see gen_mtrand.py)
+    def simulateExecution(self, rng, verbosity=0):
+        compactProg = self.compactProg
+        numThreads = compactProg.numThreads
+        numMemLocs = self.numMemLocs
+        multiCopyAtomic = self.multiCopyAtomic
+
+        self.reset()
+        pendingDeps = self.pendingDeps
+        mem = self.mem
+        bufferedCount = self.bufferedCount
+        bufferedValue = self.bufferedValue
+        storeBuffers = self.storeBuffers
+        view = self.view
+        viewSerial = self.viewSerial
+        propQueues = self.propQueues
+        threadStart = compactProg.threadStart
+        instType = compactProg.instType
+        address = compactProg.address
+        loadTarget = compactProg.loadTarget
+        memOp = compactProg.memOp
+        reverseDepPtr = compactProg.reverseDepPtr
+        reverseDepIdx = compactProg.reverseDepIdx
+
+        ## Initialize load-target register and loaded values (indexed by flat instruction index)
+        loadValues = array.array('l', [0xffffffff] * compactProg.numInsts)
+        historyLoadTargets = [[[] for i in range(self.numHistRegs)] for j in range(numThreads)]
+
+        ## Initialize ready queues (see gen_mtrand.py simulateExecutionCompact())
+        readyQueues = []
+        nextQueueInsts = []
+        for thread in range(numThreads):
+            threadReadyQueue = []
+            numThreadInsts = threadStart[thread+1] - threadStart[thread]
+            for instIndex in range(min(self.numOutstandingOps, numThreadInsts)):
+                if (pendingDeps[threadStart[thread] + instIndex] == 0):
+                    threadReadyQueue.append(instIndex)
+            readyQueues.append(threadReadyQueue)
+            nextQueueInsts.append(min(self.numOutstandingOps, numThreadInsts))
+
+        ## Pending propagations to each thread (addresses with non-empty propagation queue)
+        propAddresses = [[] for thread in range(numThreads)]
+        coherenceSerial = 0
+
+        ## Threads with any event (ready instruction, store to drain, or store to be propagated)
+        activeThreads = [thread for thread in range(numThreads) if len(readyQueues[thread]) > 0]
+        isActive = [len(readyQueues[thread]) > 0 for thread in range(numThreads)]
+
+        while (len(activeThreads) > 0):
+            ## Choose a thread
+            randInt = rng.randint(0, len(activeThreads)-1)
+            thread = activeThreads[randInt]
+
+            ## Choose an event: issue a ready instruction, drain store buffer, or propagate a store
+            readyQueue = readyQueues[thread]
+            storeBuffer = storeBuffers[thread]
+            numReady = len(readyQueue)
+            if (len(storeBuffer) > 0):
+                numDrain = 1
+            else:
+                numDrain = 0
+            randInt = rng.randint(0, numReady + numDrain + len(propAddresses[thread]) - 1)
+
+            if (randInt < numReady):
+                ## Issue an instruction
+                inst = readyQueue[randInt]
+                flat = threadStart[thread] + inst
+                if (verbosity > 1):
+                    print("Execute: thread %d inst %d (%s)" % (thread, inst, compactProg.getInstruction(flat).getAssembly()))
+                if (instType[flat] == 0):  # if instType == LOAD
+                    index = thread * numMemLocs + address[flat]
+                    if (bufferedCount[index] > 0):
+                        loadValue = bufferedValue[index]  # Store-to-load forwarding
+                    elif (multiCopyAtomic):
+                        loadValue = mem[address[flat]]
+                    else:
+                        loadValue = view[index]
+                    historyLoadTargets[thread][loadTarget[flat]].append(loadValue)
+                    loadValues[flat] = loadValue
+                elif (instType[flat] == 1):  # if instType == STORE
+                    index = thread * numMemLocs + address[flat]
+                    storeBuffer.append(flat)
+                    bufferedCount[index] += 1
+                    bufferedValue[index] = memOp[flat]
+                else:  # if instType == FENCE
+                    while (len(storeBuffer) > 0):
+                        coherenceSerial += 1
+                        self.drainStore(thread, coherenceSerial, propAddresses, activeThreads, isActive, verbosity)
+
+                # Update ready queue and wake up dependent instructions (only those in scheduling window)
+                del readyQueue[randInt]
+                windowEnd = threadStart[thread] + nextQueueInsts[thread]
+                for ptr in range(reverseDepPtr[flat], reverseDepPtr[flat+1]):
+                    depFlat = reverseDepIdx[ptr]
+                    pendingDeps[depFlat] -= 1
+                    if (pendingDeps[depFlat] == 0 and depFlat < windowEnd):
+                        readyQueue.append(depFlat - threadStart[thread])
+                if (windowEnd < threadStart[thread+1]):
+                    if (pendingDeps[windowEnd] == 0):
+                        readyQueue.append(nextQueueInsts[thread])
+                    nextQueueInsts[thread] += 1
+
+            elif (randInt < numReady + numDrain):
+                ## Drain the oldest store in store buffer
+                coherenceSerial += 1
+                self.drainStore(thread, coherenceSerial, propAddresses, activeThreads, isActive, verbosity)
+
+            else:
+                ## Propagate the oldest store to an address to this thread
+                propIndex = randInt - numReady - numDrain
+                propAddress = propAddresses[thread][propIndex]
+                index = thread * numMemLocs + propAddress
+                (serial, value) = propQueues[index].popleft()
+                if (serial > viewSerial[index]):
+                    view[index] = value
+                    viewSerial[index] = serial
+                if (verbosity > 1):
+                    print("Propagate: thread %d address 0x%X value %X" % (thread, propAddress, value))
+                if (len(propQueues[index]) == 0):
+                    del propAddresses[thread][propIndex]
+
+            ## Check for thread end
+            if (len(readyQueue) == 0 and len(storeBuffer) == 0 and len(propAddresses[thread]) == 0):
+                activeThreads.remove(thread)
+                isActive[thread] = False
+
+        return {"mem": array.array('l', mem), "history": historyLoadTargets, "loadValues": loadValues}
+
+    # Drain the oldest store in store buffer of thread (coherence order: serial)
+    def drainStore(self, thread, serial, propAddresses, activeThreads, isActive, verbosity):
+        numMemLocs = self.numMemLocs
+        flat = self.storeBuffers[thread].popleft()
+        storeAddress = self.compactProg.address[flat]
+        value = self.compactProg.memOp[flat]
+        index = thread * numMemLocs + storeAddress
+        self.bufferedCount[index] -= 1
+        self.mem[storeAddress] = value
+        if (verbosity > 1):
+            print("Drain: thread %d address 0x%X value %X" % (thread, storeAddress, value))
+        if (not self.multiCopyAtomic):
+            self.view[index] = value
+            self.viewSerial[index] = serial
+            for otherThread in range(self.compactProg.numThreads):
+                if (otherThread == thread):
+                    continue
+                propQueue = self.propQueues[otherThread * numMemLocs + storeAddress]
+                if (len(propQueue) == 0):
+                    propAddresses[otherThread].append(storeAddress)
+                propQueue.append((serial, value))
+                if (not isActive[otherThread]):
+                    activeThreads.append(otherThread)
+                    isActive[otherThread] = True
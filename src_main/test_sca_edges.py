@@ -0,0 +1,132 @@
+#!/usr/bin/python
+
+##########################################################################
+#
+# MTraceCheck
+# Copyright 2017 The Regents of the University of Michigan
+# Doowon Lee and Valeria Bertacco
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+##########################################################################
+
+#
+# Regression check of single-copy-atomicity edges of gen_mtrand.py
+#
+# NOTE: Random programs are generated twice by gen_mtrand.py (same seed),
+#       with and without --single-copy-atomicity. Intra-thread dependencies
+#       of the latter, followed by the nested-loop construction below
+#       (reference, previous implementation in gen_mtrand.py), should be the
+#       same as the former: the dependency list of every instruction in
+#       prog.txt is compared, including order and duplicates.
+#       Exits with 1 if any dependency list differs.
+#
+
+import os
+import sys
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+import instruction
+import parse_prog
+
+parser = argparse.ArgumentParser(description="Arguments for %s" % __file__)
+parser.add_argument("--verbose", "-v", action="count", default=0)
+parser.add_argument("--rand-seed", type=int, help="random seed", default=894291)
+parser.add_argument("--programs", type=int, help="number of random programs", default=100)
+parser.add_argument("--max-threads", type=int, help="maximum number of threads", default=5)
+parser.add_argument("--max-insts", type=int, help="maximum number of instructions per thread", default=300)
+parser.add_argument("--max-locs", type=int, help="maximum number of memory locations", default=8)
+args = parser.parse_args()
+
+verbosity = args.verbose
+genMtrand = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gen_mtrand.py")
+
+############################################################
+## Reference: nested-loop construction
+############################################################
+
+# Single-copy-atomicity dependencies, scanning forward from every store (O(n^2) per thread)
+# For each store A, every later load/store B to the same address depends on A,
+# until (and including) the next store to the address
+# prog[thread][inst]: assembly code, intra[thread][inst]: dependencies (instruction indices), appended
+def addReferenceSingleCopyAtomicityDependencies(prog, intra):
+    for thread in prog:
+        numInsts = len(prog[thread])
+        instTypes = [instruction.getInstType(prog[thread][inst]) for inst in range(numInsts)]
+        addresses = [instruction.getAddress(prog[thread][inst]) if instTypes[inst] != 2 else -1 for inst in range(numInsts)]
+        for instA in range(numInsts-1): # For each A for A->B edges
+            if (instTypes[instA] == 1):  # if instType == STORE
+                for instB in range(instA+1, numInsts):
+                    if (instTypes[instB] == 0 and addresses[instB] == addresses[instA]):  # if instType == LOAD with same address
+                        intra[thread][instB].append(instA)
+                    elif (instTypes[instB] == 1 and addresses[instB] == addresses[instA]):  # if instType == STORE with same address
+                        intra[thread][instB].append(instA)
+                        # Instruction B should be the source for next instructions (no further check)
+                        break
+
+# Generate a program with gen_mtrand.py, returns (prog, intra) (see parse_prog.py)
+def generateProgram(workDir, genArgs):
+    progFile = os.path.join(workDir, "prog.txt")
+    # NOTE: Program files are saved in --summary-dir
+    command = [sys.executable, genMtrand, "--gen-program", "--prog-file=prog.txt", "--wo-file=wo.txt",
+               "--log-dir=%s" % os.path.join(workDir, "log"), "--summary-dir=%s" % workDir, "--execs=1", "--no-dump-files"] + genArgs
+    devNull = open(os.devnull, "w")
+    returnCode = subprocess.call(command, stdout=devNull, cwd=workDir)
+    devNull.close()
+    if (returnCode != 0):
+        print("Error: %s failed (%d): %s" % (genMtrand, returnCode, " ".join(command)))
+        sys.exit(1)
+    returnDict = parse_prog.parseProgram(progFile, None, False, 0)
+    return (returnDict["progInfo"], returnDict["intraDep"])
+
+############################################################
+## Compare dependency lists of random programs
+############################################################
+
+rng = random.Random(args.rand_seed)
+workDir = tempfile.mkdtemp()
+numMismatches = 0
+for programIndex in range(args.programs):
+    genArgs = ["--threads=%d" % rng.randint(1, args.max_threads),
+               "--insts=%d" % rng.randint(1, args.max_insts),
+               "--locs=%d" % rng.randint(1, args.max_locs),
+               "--consistency-model=%s" % rng.choice(["sc", "tso", "ro", "wo"]),
+               "--rand-seed=%d" % rng.randint(0, 0xffffffff)]
+    if (rng.choice([False, True])):
+        genArgs.append("--with-fences")
+
+    (prog, intra) = generateProgram(workDir, genArgs + ["--single-copy-atomicity"])
+    (referenceProg, referenceIntra) = generateProgram(workDir, genArgs)
+    addReferenceSingleCopyAtomicityDependencies(referenceProg, referenceIntra)
+
+    if (verbosity > 0):
+        print("Program %d: %s" % (programIndex, " ".join(genArgs)))
+    if (prog != referenceProg):
+        numMismatches += 1
+        print("Error: Instructions differ in program %d (%s)" % (programIndex, " ".join(genArgs)))
+        continue
+    for thread in intra:
+        for inst in intra[thread]:
+            if (intra[thread][inst] != referenceIntra[thread][inst]):
+                numMismatches += 1
+                print("Error: Dependencies of instruction %d/%d differ in program %d (%s): %s, reference %s" % \
+                    (thread, inst, programIndex, " ".join(genArgs), intra[thread][inst], referenceIntra[thread][inst]))
+shutil.rmtree(workDir)
+
+if (numMismatches > 0):
+    print("Error: %d mismatches in %d programs" % (numMismatches, args.programs))
+    sys.exit(1)
+print("INFO: Dependencies of %d programs are identical" % (args.programs))
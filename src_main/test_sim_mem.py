@@ -0,0 +1,79 @@
+#!/usr/bin/python
+
+##########################################################################
+#
+# MTraceCheck
+# Copyright 2017 The Regents of the University of Michigan
+# Doowon Lee and Valeria Bertacco
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+##########################################################################
+
+#
+# Regression check of results of gen_mtrand.simulate()
+#
+# NOTE: Schedulers reuse per-execution buffers (see compact_program.py,
+#       store_buffer_sim.py), so results yielded by simulate() should not
+#       refer to them. Results of all executions are collected first, and
+#       final memory contents and loaded values of each execution are
+#       compared with a snapshot taken when the execution was yielded.
+#       Exits with 1 if results of any scheduler are not independent.
+#
+
+import sys
+import argparse
+import gen_mtrand
+
+parser = argparse.ArgumentParser(description="Arguments for %s" % __file__)
+parser.add_argument("--verbose", "-v", action="count", default=0)
+parser.add_argument("--rand-seed", type=int, help="random seed", default=894291)
+parser.add_argument("--execs", "-e", type=int, help="number of executions", default=20)
+parser.add_argument("--schedulers", help="comma-separated schedulers", default="window,event,store-buffer,batch")
+args = parser.parse_args()
+
+verbosity = args.verbose
+
+config = gen_mtrand.getDefaultConfig()
+config["numThreads"] = 4
+config["numInsts"] = 40
+config["numMemLocs"] = 4
+config["randSeed"] = args.rand_seed
+program = gen_mtrand.generateProgram(config)
+
+numErrors = 0
+for scheduler in args.schedulers.split(","):
+    results = []
+    snapshots = []
+    for (executionIndex, returnDict) in gen_mtrand.simulate(program, args.execs, seed=args.rand_seed, scheduler=scheduler, batchSize=8):
+        results.append(returnDict)
+        snapshots.append((list(returnDict["mem"]), list(returnDict["loadValues"])))
+
+    for key in ["mem", "loadValues"]:
+        numShared = len(results) - len(set([id(returnDict[key]) for returnDict in results]))
+        if (numShared > 0):
+            numErrors += 1
+            print("Error: Scheduler %s: %d executions share \"%s\" with another execution" % (scheduler, numShared, key))
+    for executionIndex in range(len(results)):
+        if ((list(results[executionIndex]["mem"]), list(results[executionIndex]["loadValues"])) != snapshots[executionIndex]):
+            numErrors += 1
+            print("Error: Scheduler %s: results of execution %d are overwritten by later executions" % (scheduler, executionIndex))
+
+    numFinalStates = len(set([tuple(snapshot[0]) for snapshot in snapshots]))
+    if (verbosity > 0):
+        print("Scheduler %s: %d executions, %d distinct final memory states" % (scheduler, len(results), numFinalStates))
+
+if (numErrors > 0):
+    print("Error: %d errors in results of simulate()" % (numErrors))
+    sys.exit(1)
+print("INFO: Results of %d executions are independent (%s)" % (args.execs, args.schedulers))
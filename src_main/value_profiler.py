@@ -26,16 +26,6 @@ import argparse
 import instruction
 import parse_prog
 
-parser = argparse.ArgumentParser(description="Arguments for %s" % __file__)
-parser.add_argument("--verbose", "-v", action="count", default=0)
-parser.add_argument("--debug", "-d", action="store_true", default=False)
-parser.add_argument("--output", "-o", default="test.txt")
-parser.add_argument("--no-profile", action="store_true", default=False)
-parser.add_argument("input", metavar="program file", help="program description file to be processed")
-args = parser.parse_args()
-
-verbosity = args.verbose
-
 def createAsmCode(loadRegisterIndex, valueTargets):
     asmString = "profile r%d,[" % loadRegisterIndex
     firstTarget = True
@@ -114,6 +104,16 @@ def generateIntermediateFile(orgProg, profileEnable, storeTable, outFileName, ve
         print("Test description %s created" % outFileName)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Arguments for %s" % __file__)
+    parser.add_argument("--verbose", "-v", action="count", default=0)
+    parser.add_argument("--debug", "-d", action="store_true", default=False)
+    parser.add_argument("--output", "-o", default="test.txt")
+    parser.add_argument("--no-profile", action="store_true", default=False)
+    parser.add_argument("input", metavar="program file", help="program description file to be processed")
+    args = parser.parse_args()
+
+    verbosity = args.verbose
+
     returnDict = parse_prog.parseProgram(args.input, None, False, verbosity)
     orgProg = returnDict["progInfo"]
     storeTable = returnDict["storeTable"]